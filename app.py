@@ -1,8 +1,17 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, g
 import google.generativeai as genai
 from recommender import ContextAwareBookRecommender
 from database import DatabaseManager
+from chat_store import ChatStore, new_chat_id, is_valid_chat_id
+from pipeline import RequestPipeline
+from sharded_search import ShardedIndex, parse_shard_addresses
+from traffic import TrafficRecorder
+from request_log import setup_request_logging, REQUEST_LOG_ENABLED
+from request_profiler import install_request_profiler
+import hmac
 import os
+import signal
+import threading
 from dotenv import load_dotenv
 import logging
 
@@ -24,20 +33,69 @@ genai.configure(api_key=GOOGLE_API_KEY)
 # Initialize database and recommender
 try:
     db_manager = DatabaseManager()
-    books_data = db_manager.get_all_books()
+    # Index builds belong to setup_mongodb.py; opt in to run them at startup too
+    if os.getenv("ENSURE_MONGODB_INDEXES") == "1":
+        db_manager.ensure_indexes()
+    # Local snapshot when it matches the catalog version, MongoDB otherwise
+    books_data = db_manager.load_books()
     logger.info(f"Successfully loaded {len(books_data)} books from database")
     
     if not books_data:
         raise ValueError("No books found in database")
         
-    # Initialize recommender with books data
-    recommender = ContextAwareBookRecommender(books_data)
+    # Initialize recommender with books data, searching remote shards when configured
+    recommender_options = {}
+    SEARCH_SHARDS = os.getenv("SEARCH_SHARDS")
+    if SEARCH_SHARDS:
+        shard_addresses = parse_shard_addresses(SEARCH_SHARDS)
+        SHARD_AUTHKEY = os.getenv("SHARD_AUTHKEY")
+        if not SHARD_AUTHKEY:
+            raise ValueError("SHARD_AUTHKEY must be set when SEARCH_SHARDS is configured")
+        shard_authkey = SHARD_AUTHKEY.encode()
+        recommender_options['index_factory'] = (
+            lambda dimension: ShardedIndex(shard_addresses, dimension, shard_authkey)
+        )
+        logger.info(f"Using sharded vector search across {len(shard_addresses)} shards")
+    recommender = ContextAwareBookRecommender(books_data, **recommender_options)
     logger.info("Recommender system initialized successfully")
     
+    # Staged request handling: retrieval and the LLM only run for book queries
+    request_pipeline = RequestPipeline(recommender)
+    
+    # Chat messages are buffered and written to MongoDB in periodic batches
+    chat_store = ChatStore(
+        db_manager.chats_collection,
+        flush_interval=float(os.getenv("CHAT_FLUSH_INTERVAL", "1.0"))
+    )
+    
 except Exception as e:
     logger.error(f"Critical error: {str(e)}")
     raise
 
+# Catalog reloads build a new index in the background and swap it in when ready
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+def is_admin_request() -> bool:
+    # Disabled unless ADMIN_TOKEN is configured; constant-time compare so the token can't be probed
+    token = request.headers.get('X-Admin-Token')
+    return bool(ADMIN_TOKEN and token and hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()))
+
+def start_catalog_reload() -> bool:
+    return recommender.start_background_reload(db_manager.load_books)
+
+if hasattr(signal, 'SIGHUP') and threading.current_thread() is threading.main_thread():
+    signal.signal(signal.SIGHUP, lambda signum, frame: start_catalog_reload())
+
+# Optionally capture live traffic for replay with load_test.py
+TRAFFIC_CAPTURE_PATH = os.getenv("TRAFFIC_CAPTURE_PATH")
+traffic_recorder = TrafficRecorder(TRAFFIC_CAPTURE_PATH) if TRAFFIC_CAPTURE_PATH else None
+
+# One sampled JSON line per request, written off the request thread
+request_logger = setup_request_logging() if REQUEST_LOG_ENABLED else None
+
+# Opt-in profiling (X-Profile header or PROFILE_SAMPLE_RATE); no hooks are installed when off
+request_profiler = install_request_profiler(app)
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -45,39 +103,42 @@ def index():
 @app.route('/get_recommendation', methods=['POST'])
 def get_recommendation():
     try:
-        data = request.json
+        data = request.json or {}
         query = data.get('query')
-        logger.info(f"Request received with data: {data}")
         
         if not query:
             logger.warning("No query provided in request")
             return jsonify({'error': 'No query provided'}), 400
         
-        logger.info(f"Processing query: {query}")
-        
-        # Get context and recommendations
-        context = recommender.get_context()
-        logger.info(f"Context retrieved: {context[:100]}...")
-        
-        similar_books = recommender.get_similar_books(query)
-        logger.info(f"Found {len(similar_books)} similar books")
-        
-        response = recommender.generate_response(query, similar_books, context)
-        logger.info(f"Generated response: {response[:100]}...")
+        if traffic_recorder:
+            traffic_recorder.record(request.path, query, data.get('chat_id'))
         
-        # Update conversation history
-        recommender.update_conversation_history(query, response)
-        logger.info("Conversation history updated")
+        # The chat id scopes the cached ranked list behind "show more"
+        chat_id = data.get('chat_id')
+        result = request_pipeline.run(query, session_id=str(chat_id) if chat_id is not None else None)
+        if request_logger:
+            request_logger.log_request({
+                'path': request.path,
+                'chat_id': chat_id,
+                'query': query,
+                'intent': result['intent'],
+                'recommendations': len(result['recommendations']),
+                'response_chars': len(result['response']),
+                'timings_ms': result['timings'],
+                'prompt': result['prompt'],
+                'profile_id': g.get('profile_id')
+            })
         
-        result = {
-            'response': response,
-            'recommendations': similar_books[:4]
-        }
-        logger.info("Sending response back to client")
-        return jsonify(result)
+        return jsonify({
+            'response': result['response'],
+            'recommendations': result['recommendations'],
+            'next_cursor': result['next_cursor']
+        })
         
     except Exception as e:
         logger.error(f"Error in get_recommendation: {str(e)}", exc_info=True)
+        if request_logger:
+            request_logger.log_request({'path': request.path, 'error': str(e)}, error=True)
         return jsonify({
             'error': str(e),
             'response': """<div class="message-paragraph">I apologize, but I'm having trouble 
@@ -85,28 +146,118 @@ def get_recommendation():
             'recommendations': []
         }), 500
 
+@app.route('/more_recommendations', methods=['POST'])
+def more_recommendations():
+    try:
+        data = request.json or {}
+        chat_id = data.get('chat_id')
+        cursor = data.get('cursor')
+        if chat_id is None or not isinstance(cursor, str):
+            return jsonify({'error': 'chat_id and cursor are required'}), 400
+        try:
+            limit = min(max(int(data.get('limit') or 4), 1), 20)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'limit must be an integer'}), 400
+        
+        # Served from the list ranked by the original query; no encode or search
+        page = request_pipeline.next_page(str(chat_id), cursor, limit)
+        if page is None:
+            return jsonify({'error': 'Cursor expired, please ask again'}), 410
+        return jsonify({'success': True, **page})
+    except Exception as e:
+        logger.error(f"Error in more_recommendations: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+MAX_MORE_LIKE_THIS = 20
+
+@app.route('/more_like_this', methods=['GET'])
+def more_like_this():
+    try:
+        title = request.args.get('title')
+        if not title:
+            return jsonify({'error': 'No title provided'}), 400
+        k = min(max(request.args.get('k', 4, type=int), 1), MAX_MORE_LIKE_THIS)
+        
+        # Uses the book's stored vector (or precomputed neighbours), never the encoder
+        recommendations = recommender.get_more_like_this(title, k)
+        if recommendations is None:
+            return jsonify({'error': 'Book not found'}), 404
+        return jsonify({'success': True, 'title': title, 'recommendations': recommendations})
+    except Exception as e:
+        logger.error(f"Error in more_like_this: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/admin/reload_catalog', methods=['POST'])
+def reload_catalog():
+    if not is_admin_request():
+        return jsonify({'error': 'Forbidden'}), 403
+    if not start_catalog_reload():
+        return jsonify({'error': 'Reload already in progress', 'status': recommender.reload_status}), 409
+    logger.info("Catalog reload started")
+    return jsonify({'success': True, 'status': recommender.reload_status}), 202
+
+@app.route('/admin/reload_status', methods=['GET'])
+def reload_status():
+    if not is_admin_request():
+        return jsonify({'error': 'Forbidden'}), 403
+    return jsonify(recommender.reload_status)
+
+@app.route('/admin/log_stats', methods=['GET'])
+def log_stats():
+    if not is_admin_request():
+        return jsonify({'error': 'Forbidden'}), 403
+    return jsonify(request_logger.stats() if request_logger else {'enabled': False})
+
+MAX_MESSAGES_PER_SAVE = 100
+
 @app.route('/get_chat_history', methods=['GET'])
 def get_chat_history():
     try:
         chat_id = request.args.get('chat_id')
-        # Here you could add database integration for permanent storage
-        return jsonify({'success': True, 'history': []})
+        if not chat_id:
+            return jsonify({'error': 'No chat_id provided'}), 400
+        # The server-issued id is the only key to a chat, so anything else is unknown
+        if not is_valid_chat_id(chat_id):
+            return jsonify({'error': 'Unknown chat_id'}), 404
+        after = request.args.get('after', 0, type=int)
+        limit = request.args.get('limit', 50, type=int)
+        
+        page = chat_store.get_history(chat_id, after=max(after, 0), limit=limit)
+        return jsonify({
+            'success': True,
+            'history': page['messages'],
+            'next_cursor': page['next_cursor'],
+            'has_more': page['has_more']
+        })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/save_chat', methods=['POST'])
 def save_chat():
     try:
-        chat_data = request.json
-        # Here you could add database integration
-        # For example with SQLAlchemy:
-        # new_chat = Chat(
-        #     chat_id=chat_data['id'],
-        #     messages=chat_data['messages']
-        # )
-        # db.session.add(new_chat)
-        # db.session.commit()
-        return jsonify({'success': True})
+        chat_data = request.json or {}
+        chat_id = chat_data.get('id')
+        cursor = chat_data.get('cursor', 0)
+        messages = chat_data.get('messages') or []
+        
+        # Clients send only the messages after their cursor, not the whole chat
+        # (bool is an int subclass, so true/false must be rejected explicitly)
+        if isinstance(cursor, bool) or not isinstance(cursor, int) or cursor < 0:
+            return jsonify({'error': 'a non-negative integer cursor is required'}), 400
+        if chat_id is None:
+            # First save of a chat: the server issues its id, which the client keeps for later saves
+            if cursor != 0:
+                return jsonify({'error': 'a new chat must start at cursor 0'}), 400
+            chat_id = new_chat_id()
+        elif not is_valid_chat_id(chat_id):
+            return jsonify({'error': 'Unknown chat id'}), 404
+        if not isinstance(messages, list) or len(messages) > MAX_MESSAGES_PER_SAVE:
+            return jsonify({'error': f'messages must be a list of at most {MAX_MESSAGES_PER_SAVE}'}), 400
+        if not all(isinstance(message, dict) for message in messages):
+            return jsonify({'error': 'each message must be an object'}), 400
+        
+        new_cursor = chat_store.append(chat_id, cursor, messages)
+        return jsonify({'success': True, 'id': chat_id, 'cursor': new_cursor})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -0,0 +1,113 @@
+import argparse
+import json
+import time
+from datetime import datetime, timezone
+from typing import Dict, List
+
+import faiss
+import numpy as np
+import pandas as pd
+
+from encoders import DEFAULT_MODEL_NAME, create_encoder
+from synthetic_data import generate_books, generate_queries
+
+
+def load_catalog(csv_path: str, size: int) -> List[Dict]:
+    if csv_path:
+        df = pd.read_csv(csv_path, nrows=size).dropna(subset=['book_name', 'summaries'])
+        return df.to_dict('records')
+    return generate_books(size)
+
+
+def measure(encoder, summaries: List[str], queries: List[str], batch_size: int) -> Dict:
+    start = time.perf_counter()
+    embeddings = encoder.encode(summaries, batch_size=batch_size, convert_to_numpy=True)
+    catalog_seconds = time.perf_counter() - start
+
+    # Queries are encoded one at a time, as in a live request
+    latencies = []
+    query_vectors = []
+    for query in queries:
+        start = time.perf_counter()
+        query_vectors.append(encoder.encode([query], convert_to_numpy=True)[0])
+        latencies.append(time.perf_counter() - start)
+    latencies_ms = np.array(latencies) * 1000
+
+    return {
+        'embeddings': np.asarray(embeddings, dtype='float32'),
+        'query_vectors': np.asarray(query_vectors, dtype='float32'),
+        'stats': {
+            'catalog_seconds': round(catalog_seconds, 3),
+            'catalog_texts_per_second': round(len(summaries) / catalog_seconds, 2),
+            'query_p50_ms': round(float(np.percentile(latencies_ms, 50)), 3),
+            'query_p99_ms': round(float(np.percentile(latencies_ms, 99)), 3)
+        }
+    }
+
+
+def top_k(embeddings: np.ndarray, query_vectors: np.ndarray, k: int) -> np.ndarray:
+    index = faiss.IndexFlatL2(embeddings.shape[1])
+    index.add(embeddings)
+    _, ids = index.search(query_vectors, k)
+    return ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full-precision and int8 quantized encoders")
+    parser.add_argument('--csv', default=None, help="Use the first --books rows of this catalog CSV")
+    parser.add_argument('--books', type=int, default=2000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--max-seq-length', type=int, default=None)
+    parser.add_argument('--model', default=DEFAULT_MODEL_NAME)
+    parser.add_argument('--output', default='benchmark_encoder.json')
+    args = parser.parse_args()
+
+    books = load_catalog(args.csv, args.books)
+    summaries = [str(book['summaries']) for book in books]
+    queries = generate_queries(args.queries, books)
+
+    runs = {}
+    for backend in ['default', 'quantized']:
+        print(f"Encoding {len(summaries)} summaries with the {backend} backend...")
+        encoder = create_encoder(backend, args.model, args.threads, args.max_seq_length)
+        runs[backend] = measure(encoder, summaries, queries, args.batch_size)
+        print(runs[backend]['stats'])
+
+    baseline, quantized = runs['default'], runs['quantized']
+    # Quality: how many of the full-precision top-k books the quantized encoder still finds
+    expected = top_k(baseline['embeddings'], baseline['query_vectors'], args.k)
+    actual = top_k(quantized['embeddings'], quantized['query_vectors'], args.k)
+    overlap = np.mean([len(set(e) & set(a)) / args.k for e, a in zip(expected, actual)])
+
+    def cosine(a, b):
+        return np.sum(a * b, axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+
+    accuracy = {
+        'top_k_overlap': round(float(overlap), 4),
+        'mean_embedding_cosine': round(float(cosine(baseline['embeddings'], quantized['embeddings']).mean()), 4),
+        'query_speedup': round(baseline['stats']['query_p50_ms'] / quantized['stats']['query_p50_ms'], 2),
+        'catalog_speedup': round(baseline['stats']['catalog_seconds'] / quantized['stats']['catalog_seconds'], 2)
+    }
+    print(accuracy)
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'benchmark': 'encoder',
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'model': args.model,
+            'books': len(summaries),
+            'queries': len(queries),
+            'k': args.k,
+            'threads': args.threads,
+            'max_seq_length': args.max_seq_length,
+            'results': {backend: run['stats'] for backend, run in runs.items()},
+            'accuracy': accuracy
+        }, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
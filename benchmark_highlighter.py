@@ -0,0 +1,115 @@
+import argparse
+import json
+import random
+import re
+import time
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from synthetic_data import generate_books
+from title_matcher import TitleMatcher
+
+FILLER = [
+    "This one is a wonderful pick if you enjoy layered characters.",
+    "Readers often mention how quickly the pages turn.",
+    "It pairs nicely with a quiet weekend and a cup of tea.",
+    "The pacing starts slow but the payoff is worth it.",
+    "Fans of the genre will recognise the classic structure here."
+]
+
+
+def build_response(length: int, retrieved: List[str], others: List[str], rng: random.Random) -> str:
+    """LLM-like text of roughly length characters mentioning retrieved and some unlisted titles"""
+    parts = []
+    size = 0
+    while size < length:
+        roll = rng.random()
+        if roll < 0.15:
+            sentence = f"I recommend {rng.choice(retrieved)} for this."
+        elif roll < 0.18:
+            sentence = f"You might also like {rng.choice(others)}."
+        else:
+            sentence = rng.choice(FILLER)
+        parts.append(sentence)
+        size += len(sentence) + 1
+    return ' '.join(parts)
+
+
+def legacy_highlight(text: str, retrieved: List[str]) -> str:
+    # What generate_response and format_response did before: one scan per title, twice
+    for title in retrieved:
+        text = text.replace(title, f"<b>{title}</b>")
+    for title in retrieved:
+        text = re.sub(fr'\b{re.escape(title)}\b', f'<span class="book-title">{title}</span>', text)
+    return text
+
+
+def legacy_detect(text: str, catalog: List[str], retrieved: List[str]) -> List[str]:
+    # Detecting unlisted titles without an automaton means scanning for every catalog title
+    allowed = set(retrieved)
+    return [title for title in catalog if title not in allowed and title in text]
+
+
+def time_call(fn, repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def run(catalog_size: int, lengths: List[int], repeats: int, legacy_detect_limit: int) -> List[Dict]:
+    rng = random.Random(catalog_size)
+    catalog = [book['book_name'] for book in generate_books(catalog_size)]
+    start = time.perf_counter()
+    matcher = TitleMatcher(catalog)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    retrieved = rng.sample(catalog, 5)
+    others = rng.sample(catalog, 20)
+    results = []
+    for length in lengths:
+        text = build_response(length, retrieved, others, rng)
+        result = {
+            'catalog_size': catalog_size,
+            'response_chars': len(text),
+            'matcher_build_ms': round(build_ms, 2),
+            'matcher_highlight_ms': round(time_call(lambda: matcher.highlight(text, retrieved), repeats), 3),
+            'legacy_highlight_ms': round(time_call(lambda: legacy_highlight(text, retrieved), repeats), 3),
+            'legacy_detect_ms': None
+        }
+        if catalog_size <= legacy_detect_limit:
+            result['legacy_detect_ms'] = round(
+                time_call(lambda: legacy_detect(text, catalog, retrieved), max(1, repeats // 10)), 3
+            )
+        results.append(result)
+        print(f"{catalog_size} titles, {len(text)} chars: matcher {result['matcher_highlight_ms']}ms "
+              f"(highlight + detection) | legacy highlight {result['legacy_highlight_ms']}ms | "
+              f"legacy detection {result['legacy_detect_ms']}ms")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark title highlighting on long responses")
+    parser.add_argument('--catalog-sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--lengths', type=int, nargs='+', default=[2_000, 20_000, 200_000])
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--legacy-detect-limit', type=int, default=10_000,
+                        help="Skip the naive detection baseline above this catalog size")
+    parser.add_argument('--output', default='benchmark_highlighter.json')
+    args = parser.parse_args()
+
+    results = []
+    for size in args.catalog_sizes:
+        results.extend(run(size, args.lengths, args.repeats, args.legacy_detect_limit))
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'benchmark': 'highlighter',
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'results': results
+        }, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
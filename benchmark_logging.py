@@ -0,0 +1,152 @@
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict
+
+import numpy as np
+
+from request_log import setup_request_logging
+from synthetic_data import generate_books, generate_queries
+
+SAMPLE_RESPONSE = "<div class=\"message-paragraph\">Here are some books you might enjoy...</div>" * 20
+
+
+def sample_payload(query: str) -> Dict:
+    # Shape of what the web client posts to /get_recommendation
+    return {
+        'query': query,
+        'chat_id': 'benchmark',
+        'context': {
+            'lastTopic': query,
+            'category': 'Fantasy',
+            'isFollowUp': False,
+            'originalQuery': query.lower(),
+            'previousRecommendations': [{'title': f"Book {i}", 'summary': "A summary. " * 30} for i in range(4)]
+        }
+    }
+
+
+def time_calls(fn: Callable[[int], None], iterations: int) -> Dict:
+    latencies = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - start)
+    latencies_us = np.array(latencies) * 1_000_000
+    return {
+        'mean_us': round(float(latencies_us.mean()), 2),
+        'p50_us': round(float(np.percentile(latencies_us, 50)), 2),
+        'p99_us': round(float(np.percentile(latencies_us, 99)), 2)
+    }
+
+
+def benchmark_calls(iterations: int, directory: str, sample_rate: float) -> Dict:
+    """Cost on the request thread of one request's worth of logging"""
+    payloads = [sample_payload(query) for query in generate_queries(256, generate_books(100))]
+    timings = {'total': 12.5, 'classify': 0.1, 'encode': 4.2, 'search': 0.8, 'generate': 7.4}
+    results = {}
+
+    # What get_recommendation used to do: five synchronous INFO lines straight to a file
+    sync_logger = logging.getLogger('benchmark.sync')
+    sync_logger.propagate = False
+    sync_logger.setLevel(logging.INFO)
+    sync_handler = logging.FileHandler(os.path.join(directory, 'sync.log'))
+    sync_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s %(message)s'))
+    sync_logger.addHandler(sync_handler)
+
+    def sync_logging(i):
+        data = payloads[i % len(payloads)]
+        sync_logger.info(f"Request received with data: {data}")
+        sync_logger.info(f"Processing query: {data['query']}")
+        sync_logger.info(f"Handled book query with 4 recommendations, stage timings (ms): {timings}")
+        sync_logger.info(f"Generated response: {SAMPLE_RESPONSE[:100]}...")
+        sync_logger.info("Sending response back to client")
+
+    results['sync_text'] = time_calls(sync_logging, iterations)
+    sync_logger.removeHandler(sync_handler)
+    sync_handler.close()
+
+    for name, rate in [('queued_json', 1.0), ('queued_json_sampled', sample_rate)]:
+        request_logger = setup_request_logging(os.path.join(directory, f'{name}.log'), sample_rate=rate)
+
+        def queued_logging(i):
+            data = payloads[i % len(payloads)]
+            request_logger.log_request({
+                'path': '/get_recommendation',
+                'chat_id': data['chat_id'],
+                'query': data['query'],
+                'intent': 'book',
+                'recommendations': 4,
+                'response_chars': len(SAMPLE_RESPONSE),
+                'timings_ms': timings
+            })
+
+        results[name] = time_calls(queued_logging, iterations)
+        results[name]['sample_rate'] = rate
+        # Stopping the listener drains the queue, so this is the writer's backlog time
+        start = time.perf_counter()
+        request_logger.close()
+        results[name]['drain_seconds'] = round(time.perf_counter() - start, 3)
+        results[name].update(dropped=request_logger.handler.dropped, sampled_out=request_logger.sampled_out)
+
+    results['disabled'] = time_calls(lambda i: None, iterations)
+    return results
+
+
+def benchmark_requests(num_requests: int, catalog_size: int) -> Dict:
+    """End-to-end /get_recommendation latency in-process, request log on vs off"""
+    from load_test import build_offline_app
+
+    app = build_offline_app(catalog_size, gemini_latency=0.0, gemini_jitter=0.0, gemini_failure_rate=0.0)
+    import app as app_module
+    client = app.test_client()
+    queries = generate_queries(num_requests, generate_books(100)) + ['hello', 'thanks']
+    results = {}
+    # Swap the app's request log for one writing to /dev/null so only the logging path is measured
+    if app_module.request_logger:
+        app_module.request_logger.close()
+    enabled_logger = setup_request_logging(os.devnull)
+    for name, request_logger in [('disabled', None), ('enabled', enabled_logger)]:
+        app_module.request_logger = request_logger
+        results[name] = time_calls(
+            lambda i: client.post('/get_recommendation', json=sample_payload(queries[i % len(queries)])),
+            num_requests
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure request logging overhead on the request thread")
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--sample-rate', type=float, default=0.1)
+    parser.add_argument('--requests', type=int, default=500, help="End-to-end requests per mode, 0 to skip")
+    parser.add_argument('--catalog-size', type=int, default=1000)
+    parser.add_argument('--output', default='benchmark_logging.json')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        calls = benchmark_calls(args.iterations, directory, args.sample_rate)
+    for name, result in calls.items():
+        print(f"{name}: {result}")
+
+    requests = benchmark_requests(args.requests, args.catalog_size) if args.requests else {}
+    for name, result in requests.items():
+        print(f"end-to-end, request log {name}: {result}")
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'benchmark': 'logging',
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'iterations': args.iterations,
+            'per_request_logging': calls,
+            'end_to_end': requests
+        }, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import argparse
+import json
+import multiprocessing
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import numpy as np
+
+from synthetic_data import generate_books, generate_queries, FakeEncoder, StubGeminiModel
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB (None if unavailable)"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS and kilobytes on Linux
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / (1024 * 1024)
+    except ImportError:
+        return None
+
+
+def build_encoder(name: str):
+    if name == 'fake':
+        return FakeEncoder()
+    # Real model must already be in the local cache to stay offline
+    from encoders import create_encoder
+    return create_encoder('quantized' if name == 'quantized' else 'default')
+
+
+def run_size(size: int, encoder_name: str, num_queries: int, k: int, seed: int) -> Dict:
+    """Benchmark one catalog size; meant to run in a fresh process so peak RSS is per size"""
+    from recommender import ContextAwareBookRecommender
+
+    start = time.perf_counter()
+    books = generate_books(size, seed=seed)
+    generate_seconds = time.perf_counter() - start
+
+    encoder = build_encoder(encoder_name)
+    start = time.perf_counter()
+    recommender = ContextAwareBookRecommender(books, model=encoder, gemini_model=StubGeminiModel())
+    build_seconds = time.perf_counter() - start
+
+    queries = generate_queries(num_queries, books, seed=seed + 1)
+    # Warm up caches before timing
+    for query in queries[:min(10, len(queries))]:
+        recommender.get_similar_books(query, k=k)
+
+    latencies = []
+    total_start = time.perf_counter()
+    for query in queries:
+        start = time.perf_counter()
+        recommender.get_similar_books(query, k=k)
+        latencies.append(time.perf_counter() - start)
+    total_seconds = time.perf_counter() - total_start
+
+    latencies_ms = np.array(latencies) * 1000
+    peak_rss = peak_rss_mb()
+    return {
+        'catalog_size': size,
+        'encoder': encoder_name,
+        'queries': num_queries,
+        'k': k,
+        'generate_seconds': round(generate_seconds, 3),
+        'index_build_seconds': round(build_seconds, 3),
+        'peak_rss_mb': round(peak_rss, 1) if peak_rss is not None else None,
+        'latency_p50_ms': round(float(np.percentile(latencies_ms, 50)), 3),
+        'latency_p99_ms': round(float(np.percentile(latencies_ms, 99)), 3),
+        'latency_mean_ms': round(float(latencies_ms.mean()), 3),
+        'queries_per_second': round(num_queries / total_seconds, 2) if total_seconds else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark retrieval on synthetic catalogs")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--encoder', choices=['fake', 'real', 'quantized'], default='fake')
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='benchmark_retrieval.json')
+    args = parser.parse_args()
+
+    results = []
+    # Fresh process per size so each peak RSS figure is not inflated by the previous run
+    context = multiprocessing.get_context('spawn')
+    for size in args.sizes:
+        print(f"Benchmarking {size} books with {args.encoder} encoder...")
+        with context.Pool(1) as pool:
+            result = pool.apply(run_size, (size, args.encoder, args.queries, args.k, args.seed))
+        results.append(result)
+        print(f"  build {result['index_build_seconds']}s | "
+              f"p50 {result['latency_p50_ms']}ms | p99 {result['latency_p99_ms']}ms | "
+              f"{result['queries_per_second']} q/s | peak RSS {result['peak_rss_mb']} MB")
+
+    report = {
+        'benchmark': 'retrieval',
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timezone
+from typing import Dict, List
+
+import numpy as np
+
+from synthetic_data import generate_books, generate_queries, FakeEncoder, StubGeminiModel
+from session_vectors import SessionVectorCache
+
+FOLLOW_UPS = [
+    "more like that but darker",
+    "something similar but shorter",
+    "any others like those?",
+    "more like the first one",
+    "similar but with a happier ending"
+]
+
+
+def percentiles(latencies: List[float]) -> Dict:
+    latencies_us = np.array(latencies) * 1_000_000
+    return {
+        'p50_us': round(float(np.percentile(latencies_us, 50)), 2),
+        'p99_us': round(float(np.percentile(latencies_us, 99)), 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the cost of blending session query vectors before search")
+    parser.add_argument('--books', type=int, default=100_000)
+    parser.add_argument('--sessions', type=int, default=500)
+    parser.add_argument('--turns', type=int, default=4, help="Queries per session: one opener plus follow-ups")
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--output', default='benchmark_session_retrieval.json')
+    args = parser.parse_args()
+
+    from recommender import ContextAwareBookRecommender
+
+    books = generate_books(args.books)
+    recommender = ContextAwareBookRecommender(books, model=FakeEncoder(), gemini_model=StubGeminiModel(),
+                                              response_cache_size=0)
+    openers = generate_queries(args.sessions, books)
+    cache = SessionVectorCache()
+    rng = random.Random(3)
+
+    timings = {'encode': [], 'blend': [], 'search': []}
+    kept_context = []
+    for session, opener in enumerate(openers):
+        first_titles = None
+        for turn in range(args.turns):
+            query = opener if turn == 0 else rng.choice(FOLLOW_UPS)
+
+            start = time.perf_counter()
+            query_vector = recommender.encode_query(query)
+            timings['encode'].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            blended = cache.blend(session, query_vector)
+            timings['blend'].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            results = recommender.search_similar(blended, args.k)
+            timings['search'].append(time.perf_counter() - start)
+
+            titles = {book['title'] for book in results}
+            if turn == 0:
+                first_titles = titles
+                continue
+            # How much of the opener's result set a follow-up still shares, with and without the session
+            alone = {book['title'] for book in recommender.search_similar(query_vector, args.k)}
+            kept_context.append((len(titles & first_titles) / args.k, len(alone & first_titles) / args.k))
+
+    stats = {stage: percentiles(values) for stage, values in timings.items()}
+    blend_share = np.median(timings['blend']) / np.median(np.array(timings['encode']) + np.array(timings['search']))
+    overlap = np.array(kept_context)
+    result = {
+        'stages': stats,
+        'blend_share_of_retrieval': round(float(blend_share), 5),
+        'follow_up_overlap_with_opener': {
+            'blended': round(float(overlap[:, 0].mean()), 3),
+            'query_only': round(float(overlap[:, 1].mean()), 3)
+        },
+        'sessions_cached': len(cache)
+    }
+    print(json.dumps(result, indent=2))
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'benchmark': 'session_retrieval',
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'books': args.books,
+            'sessions': args.sessions,
+            'turns': args.turns,
+            'encoder': 'fake',
+            'results': result
+        }, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict
+
+import faiss
+import numpy as np
+
+from sharded_search import LocalShardCluster
+
+
+def measure(index, queries: np.ndarray, k: int, clients: int) -> Dict:
+    # Sequential single queries give per-request latency
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query[None, :], k)
+        latencies.append(time.perf_counter() - start)
+    latencies_ms = np.array(latencies) * 1000
+
+    # Concurrent clients give throughput under load
+    def worker(chunk):
+        for query in chunk:
+            index.search(query[None, :], k)
+
+    chunks = np.array_split(queries, clients)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        list(executor.map(worker, chunks))
+    elapsed = time.perf_counter() - start
+
+    return {
+        'latency_p50_ms': round(float(np.percentile(latencies_ms, 50)), 3),
+        'latency_p99_ms': round(float(np.percentile(latencies_ms, 99)), 3),
+        'queries_per_second': round(len(queries) / elapsed, 2),
+        'clients': clients
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sharded scatter-gather search")
+    parser.add_argument('--vectors', type=int, default=200_000)
+    parser.add_argument('--dimension', type=int, default=384)
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--threads-per-shard', type=int, default=1)
+    parser.add_argument('--output', default='benchmark_sharding.json')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    vectors = rng.random((args.vectors, args.dimension), dtype='float32')
+    queries = rng.random((args.queries, args.dimension), dtype='float32')
+
+    results = []
+    start = time.perf_counter()
+    baseline = faiss.IndexFlatL2(args.dimension)
+    baseline.add(vectors)
+    result = {'mode': 'in-process', 'shards': 0, 'build_seconds': round(time.perf_counter() - start, 3)}
+    result.update(measure(baseline, queries, args.k, args.clients))
+    results.append(result)
+    print(result)
+    _, expected_ids = baseline.search(queries, args.k)
+    del baseline
+
+    for num_shards in args.shards:
+        with LocalShardCluster(num_shards, threads_per_shard=args.threads_per_shard) as cluster:
+            start = time.perf_counter()
+            index = cluster.index_factory(args.dimension)
+            index.add(vectors)
+            result = {'mode': 'sharded', 'shards': num_shards,
+                      'build_seconds': round(time.perf_counter() - start, 3)}
+            # Sharding must not change the answer
+            _, ids = index.search(queries, args.k)
+            result['matches_in_process'] = bool((ids == expected_ids).mean() > 0.999)
+            result.update(measure(index, queries, args.k, args.clients))
+            index.close()
+        results.append(result)
+        print(result)
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'benchmark': 'sharding',
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'vectors': args.vectors,
+            'dimension': args.dimension,
+            'results': results
+        }, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import os
+import tempfile
+import zipfile
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+
+# Bump when the on-disk layout changes; older files are then ignored
+SNAPSHOT_FORMAT = 2
+SNAPSHOT_FIELDS = ['book_name', 'summaries', 'categories']
+
+
+def write_snapshot(path: str, books: List[Dict], version: int, document_count: int, fields: List[str] = None):
+    """Write books column by column: per field one UTF-8 byte blob plus int64 row offsets.
+
+    Plain numpy arrays in an uncompressed .npz, so loading is a few large reads
+    and needs no pickle. Written to a temporary file of its own in the same
+    directory and renamed into place, so concurrent writers never share it.
+    document_count is the collection's document count when the snapshot was taken.
+    """
+    fields = fields or SNAPSHOT_FIELDS
+    arrays = {
+        'format': np.array(SNAPSHOT_FORMAT, dtype='int64'),
+        'version': np.array(version, dtype='int64'),
+        'document_count': np.array(document_count, dtype='int64'),
+        'fields': np.array(fields)
+    }
+    for field in fields:
+        # Stringified exactly as ContextAwareBookRecommender.clean_book_data does
+        encoded = [str(book.get(field, '')).encode('utf-8') for book in books]
+        offsets = np.zeros(len(encoded) + 1, dtype='int64')
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        arrays[f"{field}_offsets"] = offsets
+        arrays[f"{field}_data"] = np.frombuffer(b''.join(encoded), dtype='uint8')
+
+    fd, tmp_path = tempfile.mkstemp(suffix='.npz', dir=os.path.dirname(path) or '.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def read_snapshot_stamp(path: str) -> Optional[Tuple[int, int]]:
+    """(catalog version, document count) a snapshot was taken at, or None if it is missing or unreadable"""
+    try:
+        # Members of an .npz are read lazily, so this does not touch the text columns
+        with np.load(path, allow_pickle=False) as data:
+            if int(data['format']) != SNAPSHOT_FORMAT:
+                return None
+            return int(data['version']), int(data['document_count'])
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        return None
+
+
+def read_snapshot(path: str) -> Tuple[int, List[Dict]]:
+    """Load a snapshot back into the list of book dicts that get_all_books returns"""
+    with np.load(path, allow_pickle=False) as data:
+        version = int(data['version'])
+        fields = [str(field) for field in data['fields']]
+        columns = []
+        for field in fields:
+            blob = data[f"{field}_data"].tobytes()
+            offsets = data[f"{field}_offsets"].tolist()
+            columns.append([blob[start:end].decode('utf-8') for start, end in zip(offsets, offsets[1:])])
+    books = [dict(zip(fields, values)) for values in zip(*columns)]
+    return version, books
@@ -0,0 +1,140 @@
+import atexit
+import re
+import secrets
+import threading
+from datetime import datetime, timezone
+from typing import List, Dict
+
+from pymongo import ASCENDING
+from pymongo.errors import BulkWriteError
+
+from database import DUPLICATE_KEY_ERROR
+
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_MAX_BATCH = 500
+DEFAULT_HISTORY_LIMIT = 50
+MAX_HISTORY_LIMIT = 200
+# Chat ids are issued by the server and double as the access key to a chat
+CHAT_ID_BYTES = 18
+CHAT_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]{24}')
+
+
+def new_chat_id() -> str:
+    """Unguessable id for a new chat (24 URL-safe characters)"""
+    return secrets.token_urlsafe(CHAT_ID_BYTES)
+
+
+def is_valid_chat_id(chat_id) -> bool:
+    return isinstance(chat_id, str) and CHAT_ID_PATTERN.fullmatch(chat_id) is not None
+
+
+class ChatStore:
+    """Append-only chat storage with buffered bulk writes.
+
+    Clients send only the messages after their cursor (the number of messages
+    the server already acknowledged). Message seq numbers are derived from the
+    cursor and the first write of each seq wins, whether it is still buffered
+    or already stored, so a retried save never changes a message. Writes
+    collect in memory and go out as one unordered insert_many every
+    flush_interval seconds or once max_batch messages are pending.
+    """
+
+    def __init__(self, collection, flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 max_batch: int = DEFAULT_MAX_BATCH):
+        self.collection = collection
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._flush_loop, name='chat-store-flush', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def append(self, chat_id: str, cursor: int, messages: List[Dict]) -> int:
+        """Buffer messages that follow cursor and return the new cursor"""
+        now = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            for offset, message in enumerate(messages):
+                seq = cursor + offset
+                # A resend never replaces the buffered copy; once stored, the unique index drops it
+                self._pending.setdefault((chat_id, seq), {
+                    'chat_id': chat_id,
+                    'seq': seq,
+                    'role': message.get('role'),
+                    'content': message.get('content'),
+                    'timestamp': message.get('timestamp') or now
+                })
+            backlog = len(self._pending)
+        if backlog >= self.max_batch:
+            self._wake.set()
+        return cursor + len(messages)
+
+    def get_history(self, chat_id: str, after: int = 0, limit: int = DEFAULT_HISTORY_LIMIT) -> Dict:
+        """One page of messages with seq >= after, including writes not flushed yet"""
+        limit = max(1, min(limit, MAX_HISTORY_LIMIT))
+        # Fetch one extra row to know whether another page exists
+        stored = list(
+            self.collection.find({'chat_id': chat_id, 'seq': {'$gte': after}}, {'_id': 0, 'chat_id': 0})
+            .sort('seq', ASCENDING)
+            .limit(limit + 1)
+        )
+        with self._lock:
+            buffered = [
+                {k: v for k, v in message.items() if k != 'chat_id'}
+                for (pending_chat, seq), message in self._pending.items()
+                if pending_chat == chat_id and seq >= after
+            ]
+        # Stored messages win: a buffered copy of a stored seq is a resend the flush will drop
+        merged = {message['seq']: message for message in buffered}
+        merged.update({message['seq']: message for message in stored})
+        messages = [merged[seq] for seq in sorted(merged)][:limit + 1]
+
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+        next_cursor = messages[-1]['seq'] + 1 if messages else after
+        return {'messages': messages, 'next_cursor': next_cursor, 'has_more': has_more}
+
+    def flush(self) -> int:
+        """Write all buffered messages in one unordered bulk insert"""
+        with self._flush_lock:
+            with self._lock:
+                batch = self._pending
+                self._pending = {}
+            if not batch:
+                return 0
+            try:
+                self.collection.insert_many(list(batch.values()), ordered=False)
+            except BulkWriteError as e:
+                errors = e.details.get('writeErrors', [])
+                failed = [err for err in errors if err.get('code') != DUPLICATE_KEY_ERROR]
+                if failed:
+                    print(f"Error saving {len(failed)} chat messages, will retry")
+                    self._requeue([err['op'] for err in failed])
+            except Exception as e:
+                print(f"Error saving chat messages, will retry: {str(e)}")
+                self._requeue(batch.values())
+            return len(batch)
+
+    def _requeue(self, messages):
+        with self._lock:
+            for message in messages:
+                message.pop('_id', None)
+                # The failed copy was written first, so it replaces any resend buffered since
+                self._pending[(message['chat_id'], message['seq'])] = message
+
+    def _flush_loop(self):
+        while not self._stopped:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self):
+        if self._stopped:
+            return
+        self._stopped = True
+        self._wake.set()
+        self._thread.join(timeout=5)
+        self.flush()
@@ -1,8 +1,55 @@
-from pymongo import MongoClient
-from typing import List, Dict
+from pymongo import MongoClient, UpdateOne, ReturnDocument, ASCENDING, TEXT
+from pymongo.errors import BulkWriteError, OperationFailure
+from typing import List, Dict, Optional, Tuple
+from datetime import datetime, timezone
+import hashlib
 import os
+import re
 from dotenv import load_dotenv
 import certifi
+from catalog_snapshot import write_snapshot, read_snapshot, read_snapshot_stamp
+
+DEFAULT_PAGE_SIZE = 20
+BOOK_FIELDS = ['book_name', 'summaries', 'categories']
+BOOK_PROJECTION = {'_id': 0, 'book_name': 1, 'summaries': 1, 'categories': 1}
+DUPLICATE_KEY_ERROR = 11000
+HASH_PROJECTION = {'_id': 0, 'book_name': 1, 'content_hash': 1}
+# Local columnar copy of the catalog used at startup when its version and size are current; '' disables it
+CATALOG_SNAPSHOT_PATH = os.getenv("CATALOG_SNAPSHOT_PATH", "catalog_snapshot.npz")
+CATALOG_META_ID = 'books'
+
+def content_hash(book: Dict) -> str:
+    """Fingerprint of the fields the recommender embeds and shows; changes whenever any of them does"""
+    parts = ['' if book.get(field) is None else str(book.get(field)) for field in BOOK_FIELDS]
+    return hashlib.sha1('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+def with_content_hash(book: Dict) -> Dict:
+    return dict(book, content_hash=content_hash(book))
+
+def create_book_indexes(collection) -> bool:
+    """Create the indexes behind title, category and full-text lookups (idempotent)"""
+    try:
+        # Compound index serves category filters and their book_name ordering
+        collection.create_index([('categories', ASCENDING), ('book_name', ASCENDING)],
+                                name='categories_book_name')
+        collection.create_index([('book_name', TEXT), ('summaries', TEXT)],
+                                name='title_summary_text', weights={'book_name': 10, 'summaries': 1})
+        collection.create_index([('book_name', ASCENDING)], name='book_name_unique', unique=True)
+        return True
+    except OperationFailure as e:
+        # Most likely duplicate titles already stored, which block the unique index
+        print(f"Error creating indexes: {str(e)}")
+        return False
+
+def create_chat_indexes(collection) -> bool:
+    """One document per chat message; (chat_id, seq) is unique so resent deltas are no-ops"""
+    try:
+        collection.create_index([('chat_id', ASCENDING), ('seq', ASCENDING)],
+                                name='chat_id_seq_unique', unique=True)
+        return True
+    except OperationFailure as e:
+        print(f"Error creating chat indexes: {str(e)}")
+        return False
 
 class DatabaseManager:
     def __init__(self):
@@ -17,6 +64,9 @@ class DatabaseManager:
         self.client = MongoClient(mongodb_uri, tlsCAFile=certifi.where())
         self.db = self.client['book_recommender']
         self.books_collection = self.db['books']
+        self.chats_collection = self.db['chat_messages']
+        # Holds the catalog version, bumped by every write made through this class
+        self.meta_collection = self.db['catalog_meta']
         
         # Test connection
         try:
@@ -26,6 +76,16 @@ class DatabaseManager:
             print(f"❌ Connection failed: {str(e)}")
             raise
         
+    def ensure_indexes(self) -> bool:
+        """Make sure the books and chat collections have their query indexes.
+
+        Not run on connect: setup_mongodb.py and ingest_catalog.py call it, and
+        the app only does when ENSURE_MONGODB_INDEXES=1.
+        """
+        books_ok = create_book_indexes(self.books_collection)
+        chats_ok = create_chat_indexes(self.chats_collection)
+        return books_ok and chats_ok
+        
     def get_all_books(self) -> List[Dict]:
         """Retrieve all books from database with validation"""
         try:
@@ -43,10 +103,79 @@ class DatabaseManager:
             print(f"Error retrieving books: {str(e)}")
             return []
         
+    def get_catalog_version(self) -> int:
+        """Version of the books collection; 0 until the first tracked write"""
+        meta = self.meta_collection.find_one({'_id': CATALOG_META_ID})
+        return meta['version'] if meta else 0
+        
+    def bump_catalog_version(self) -> int:
+        meta = self.meta_collection.find_one_and_update(
+            {'_id': CATALOG_META_ID},
+            {'$inc': {'version': 1}, '$set': {'updated_at': datetime.now(timezone.utc)}},
+            upsert=True, return_document=ReturnDocument.AFTER
+        )
+        return meta['version']
+        
+    def get_catalog_stamp(self) -> Tuple[int, int]:
+        """(version, document count) a snapshot must match to be used.
+
+        The version only moves on writes made through this class. The count comes
+        from collection metadata (estimated_document_count, no scan), so inserts
+        and deletes made by other tools (Atlas UI, mongoimport) also invalidate
+        the snapshot. In-place edits made outside this class that keep the count
+        are NOT detected: run bump_catalog_version() after such edits.
+        """
+        return self.get_catalog_version(), self.books_collection.estimated_document_count()
+        
+    def export_snapshot(self, path: str = None) -> Optional[int]:
+        """Write the catalog to a local columnar snapshot; returns its version, None if it changed mid-export"""
+        path = path or CATALOG_SNAPSHOT_PATH
+        stamp = self.get_catalog_stamp()
+        books = self.get_all_books()
+        return self._write_snapshot_if_current(path, books, stamp)
+        
+    def _write_snapshot_if_current(self, path: str, books: List[Dict], stamp: Tuple[int, int]) -> Optional[int]:
+        # A write between reading the stamp and the books would mislabel the snapshot
+        if not books or self.get_catalog_stamp() != stamp:
+            return None
+        version, document_count = stamp
+        try:
+            write_snapshot(path, books, version, document_count)
+            return version
+        except OSError as e:
+            print(f"Error writing catalog snapshot: {str(e)}")
+            return None
+        
+    def load_books(self, snapshot_path: str = None) -> List[Dict]:
+        """Catalog from the local snapshot when it matches the database stamp, else from MongoDB.
+
+        See get_catalog_stamp for which outside writes are detected. After a
+        MongoDB load the snapshot is rewritten, so the next start is fast again.
+        """
+        snapshot_path = CATALOG_SNAPSHOT_PATH if snapshot_path is None else snapshot_path
+        if not snapshot_path:
+            return self.get_all_books()
+        stamp = self.get_catalog_stamp()
+        snapshot_stamp = read_snapshot_stamp(snapshot_path)
+        if snapshot_stamp == stamp:
+            try:
+                _, books = read_snapshot(snapshot_path)
+                print(f"Loaded {len(books)} books from snapshot {snapshot_path} (version {stamp[0]})")
+                return books
+            except Exception as e:
+                print(f"Error reading catalog snapshot, loading from database: {str(e)}")
+        elif snapshot_stamp is not None:
+            print(f"Catalog snapshot is stale (snapshot {snapshot_stamp}, database {stamp}), loading from database")
+        books = self.get_all_books()
+        if self._write_snapshot_if_current(snapshot_path, books, stamp) is not None:
+            print(f"Saved catalog snapshot {snapshot_path} (version {stamp[0]})")
+        return books
+        
     def add_book(self, book: Dict) -> bool:
         """Add a new book to database"""
         try:
-            self.books_collection.insert_one(book)
+            self.books_collection.insert_one(with_content_hash(book))
+            self.bump_catalog_version()
             return True
         except Exception as e:
             print(f"Error adding book: {str(e)}")
@@ -55,28 +184,159 @@ class DatabaseManager:
     def add_many_books(self, books: List[Dict]) -> bool:
         """Add multiple books to database with duplicate checking"""
         try:
-            # Check for duplicates before inserting
+            # Check for duplicates within the batch before inserting
             unique_books = []
             seen_titles = set()
             
             for book in books:
                 if book['book_name'] not in seen_titles:
                     seen_titles.add(book['book_name'])
-                    unique_books.append(book)
+                    unique_books.append(with_content_hash(book))
             
-            if unique_books:
-                self.books_collection.insert_many(unique_books)
-                print(f"Added {len(unique_books)} unique books")
-                return True
-            return False
+            if not unique_books:
+                return False
+            
+            # Titles already stored are rejected by the unique book_name index
+            try:
+                result = self.books_collection.insert_many(unique_books, ordered=False)
+                inserted = len(result.inserted_ids)
+            except BulkWriteError as e:
+                errors = e.details.get('writeErrors', [])
+                if any(err.get('code') != DUPLICATE_KEY_ERROR for err in errors):
+                    raise
+                inserted = e.details.get('nInserted', 0)
+                print(f"Skipped {len(errors)} books already in database")
+            
+            if inserted:
+                self.bump_catalog_version()
+            print(f"Added {inserted} unique books")
+            return True
             
         except Exception as e:
             print(f"Error adding books: {str(e)}")
             return False
             
-    def search_books(self, query: Dict) -> List[Dict]:
-        """Search books with specific criteria"""
-        return list(self.books_collection.find(query, {'_id': 0}))
+    def upsert_many_books(self, books: List[Dict]) -> Optional[Dict]:
+        """Unordered bulk upsert keyed on book_name, stamping each book's content_hash"""
+        try:
+            operations = [
+                UpdateOne({'book_name': book['book_name']}, {'$set': with_content_hash(book)}, upsert=True)
+                for book in books
+            ]
+            if not operations:
+                return {'upserted': 0, 'modified': 0, 'matched': 0}
+            result = self.books_collection.bulk_write(operations, ordered=False)
+            if result.upserted_count or result.modified_count:
+                self.bump_catalog_version()
+            return {
+                'upserted': result.upserted_count,
+                'modified': result.modified_count,
+                'matched': result.matched_count
+            }
+        except Exception as e:
+            print(f"Error upserting books: {str(e)}")
+            return None
+            
+    def get_content_hashes(self) -> Dict[str, str]:
+        """book_name -> content_hash for every stored book, fetching only those two fields"""
+        return {doc['book_name']: doc.get('content_hash')
+                for doc in self.books_collection.find({'book_name': {'$exists': True}}, HASH_PROJECTION)}
+        
+    def backfill_content_hashes(self, batch_size: int = 1000) -> int:
+        """Stamp content_hash on books stored before hashing existed; returns how many were updated"""
+        updated = 0
+        operations = []
+        for book in self.books_collection.find({'content_hash': {'$exists': False}}, BOOK_PROJECTION):
+            if 'book_name' not in book:
+                continue
+            operations.append(UpdateOne({'book_name': book['book_name']},
+                                        {'$set': {'content_hash': content_hash(book)}}))
+            if len(operations) >= batch_size:
+                updated += self.books_collection.bulk_write(operations, ordered=False).modified_count
+                operations = []
+        if operations:
+            updated += self.books_collection.bulk_write(operations, ordered=False).modified_count
+        return updated
+        
+    def delete_books(self, titles: List[str], batch_size: int = 1000) -> int:
+        """Delete books by title in batches; returns the number removed"""
+        deleted = 0
+        for start in range(0, len(titles), batch_size):
+            result = self.books_collection.delete_many({'book_name': {'$in': titles[start:start + batch_size]}})
+            deleted += result.deleted_count
+        if deleted:
+            self.bump_catalog_version()
+        return deleted
+        
+    def search_books(self, query: Dict, page: int = None, page_size: int = DEFAULT_PAGE_SIZE,
+                     projection: Dict = None) -> List[Dict]:
+        """Search books with specific criteria, optionally one page at a time"""
+        cursor = self.books_collection.find(query, projection or {'_id': 0})
+        if page is not None:
+            cursor = cursor.sort('book_name', ASCENDING).skip((max(page, 1) - 1) * page_size).limit(page_size)
+        return list(cursor)
+        
+    def find_book_by_title(self, title: str, projection: Dict = None) -> Optional[Dict]:
+        """Exact title lookup served by the unique book_name index"""
+        return self.books_collection.find_one({'book_name': title}, projection or BOOK_PROJECTION)
+        
+    def find_books_by_title_prefix(self, prefix: str, page: int = 1, page_size: int = DEFAULT_PAGE_SIZE,
+                                   projection: Dict = None) -> List[Dict]:
+        """Titles starting with prefix; an anchored case-sensitive regex can walk the index"""
+        query = {'book_name': {'$regex': f"^{re.escape(prefix)}"}}
+        return self.search_books(query, page, page_size, projection or BOOK_PROJECTION)
+        
+    def find_books_by_category(self, category: str, page: int = 1, page_size: int = DEFAULT_PAGE_SIZE,
+                               projection: Dict = None) -> List[Dict]:
+        """Books in a category, ordered by title via the categories_book_name index"""
+        return self.search_books({'categories': category}, page, page_size, projection or BOOK_PROJECTION)
+        
+    def text_search_books(self, text: str, page: int = 1, page_size: int = DEFAULT_PAGE_SIZE) -> List[Dict]:
+        """Full-text search over titles and summaries, best matches first"""
+        projection = dict(BOOK_PROJECTION, score={'$meta': 'textScore'})
+        cursor = (self.books_collection.find({'$text': {'$search': text}}, projection)
+                  .sort([('score', {'$meta': 'textScore'})])
+                  .skip((max(page, 1) - 1) * page_size)
+                  .limit(page_size))
+        return list(cursor)
+        
+    def count_books(self, query: Dict = None) -> int:
+        """Count matching books on the server"""
+        return self.books_collection.count_documents(query or {})
+        
+    def field_quality_report(self, fields: List[str] = None) -> Dict:
+        """Count missing and non-string values per field in one server-side pass.
+
+        Missing means absent, null or an empty string; invalid means present
+        with any BSON type other than string.
+        """
+        fields = fields or BOOK_FIELDS
+        group = {'_id': None, 'total': {'$sum': 1}}
+        for field in fields:
+            field_type = {'$type': f"${field}"}
+            group[f"missing_{field}"] = {'$sum': {'$cond': [
+                {'$or': [{'$in': [field_type, ['missing', 'null']]}, {'$eq': [f"${field}", '']}]}, 1, 0
+            ]}}
+            group[f"invalid_{field}"] = {'$sum': {'$cond': [
+                {'$not': [{'$in': [field_type, ['missing', 'null', 'string']]}]}, 1, 0
+            ]}}
+        result = next(self.books_collection.aggregate([{'$group': group}], allowDiskUse=True), None)
+        report = {'total': result['total'] if result else 0, 'missing': {}, 'invalid': {}}
+        for field in fields:
+            report['missing'][field] = result[f"missing_{field}"] if result else 0
+            report['invalid'][field] = result[f"invalid_{field}"] if result else 0
+        return report
+        
+    def field_type_counts(self, field: str) -> Dict[str, int]:
+        """How many documents hold each BSON type for a field ('missing' when absent)"""
+        pipeline = [{'$group': {'_id': {'$type': f"${field}"}, 'count': {'$sum': 1}}}]
+        return {row['_id']: row['count'] for row in self.books_collection.aggregate(pipeline, allowDiskUse=True)}
+        
+    def count_distinct_titles(self) -> int:
+        """Number of distinct book_name values, counted on the server"""
+        pipeline = [{'$group': {'_id': '$book_name'}}, {'$count': 'titles'}]
+        result = next(self.books_collection.aggregate(pipeline, allowDiskUse=True), None)
+        return result['titles'] if result else 0
         
     def update_book(self, book_name: str, updates: Dict) -> bool:
         """Update a book's information"""
@@ -85,6 +345,14 @@ class DatabaseManager:
                 {'book_name': book_name},
                 {'$set': updates}
             )
+            # Keep the fingerprint in step when a hashed field changed
+            if any(field in updates for field in BOOK_FIELDS):
+                book = self.books_collection.find_one({'book_name': updates.get('book_name', book_name)},
+                                                      BOOK_PROJECTION)
+                if book:
+                    self.books_collection.update_one({'book_name': book['book_name']},
+                                                     {'$set': {'content_hash': content_hash(book)}})
+                self.bump_catalog_version()
             return True
         except Exception as e:
             print(f"Error updating book: {str(e)}")
@@ -94,6 +362,7 @@ class DatabaseManager:
         """Clear the books collection"""
         try:
             self.books_collection.delete_many({})
+            self.bump_catalog_version()
             return True
         except Exception as e:
             print(f"Error clearing collection: {str(e)}")
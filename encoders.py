@@ -0,0 +1,77 @@
+import os
+from typing import List
+
+import numpy as np
+import torch
+from sentence_transformers import SentenceTransformer
+
+DEFAULT_MODEL_NAME = 'paraphrase-MiniLM-L6-v2'
+
+# Encoder settings; ENCODER_BACKEND is 'default' (full precision) or 'quantized' (int8)
+ENCODER_BACKEND = os.getenv("ENCODER_BACKEND", "default")
+ENCODER_THREADS = int(os.getenv("ENCODER_THREADS", "0")) or None
+ENCODER_MAX_SEQ_LENGTH = int(os.getenv("ENCODER_MAX_SEQ_LENGTH", "0")) or None
+
+
+def configure_torch_threads(intra_op_threads: int = None, inter_op_threads: int = None):
+    """Set torch CPU thread pools; inter-op can only change before torch does parallel work"""
+    if intra_op_threads:
+        torch.set_num_threads(intra_op_threads)
+    if inter_op_threads:
+        try:
+            torch.set_num_interop_threads(inter_op_threads)
+        except RuntimeError as e:
+            print(f"Could not set inter-op threads: {str(e)}")
+
+
+class QuantizedSentenceEncoder:
+    """SentenceTransformer with int8 dynamic quantization of its Linear layers for CPU.
+
+    Weights are stored as int8 and activations are quantized on the fly, which
+    typically speeds up MiniLM-sized transformers on CPU while keeping the
+    embeddings close to full precision. Same encode() interface as
+    SentenceTransformer, so it can be passed as ContextAwareBookRecommender(model=...).
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, intra_op_threads: int = None,
+                 inter_op_threads: int = None, max_seq_length: int = None):
+        configure_torch_threads(intra_op_threads, inter_op_threads)
+        model = SentenceTransformer(model_name, device='cpu')
+        if max_seq_length:
+            # Longer inputs are truncated; summaries rarely need the full window
+            model.max_seq_length = max_seq_length
+        model.eval()
+        self.model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.max_seq_length = self.model.max_seq_length
+        self.encoder_signature = f"quantized:{model_name}:{self.max_seq_length}"
+
+    def encode(self, sentences: List[str], **kwargs) -> np.ndarray:
+        kwargs.setdefault('convert_to_numpy', True)
+        with torch.inference_mode():
+            return self.model.encode(sentences, **kwargs)
+
+
+def create_encoder(backend: str = None, model_name: str = DEFAULT_MODEL_NAME, intra_op_threads: int = None,
+                   max_seq_length: int = None):
+    """Build the query/catalog encoder, defaulting to the ENCODER_* settings"""
+    backend = backend or ENCODER_BACKEND
+    intra_op_threads = intra_op_threads or ENCODER_THREADS
+    max_seq_length = max_seq_length or ENCODER_MAX_SEQ_LENGTH
+    if backend == 'quantized':
+        return QuantizedSentenceEncoder(model_name, intra_op_threads, max_seq_length=max_seq_length)
+    if backend != 'default':
+        raise ValueError(f"Unknown encoder backend: {backend}")
+    configure_torch_threads(intra_op_threads)
+    model = SentenceTransformer(model_name)
+    if max_seq_length:
+        model.max_seq_length = max_seq_length
+    model.encoder_signature = f"default:{model_name}:{model.max_seq_length}"
+    return model
+
+
+def encoder_signature(model) -> str:
+    """Backend, model name and sequence length that precomputed vectors must match.
+
+    Encoders not built by create_encoder fall back to their class name.
+    """
+    return getattr(model, 'encoder_signature', None) or type(model).__name__
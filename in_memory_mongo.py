@@ -0,0 +1,374 @@
+import copy
+import threading
+from datetime import datetime
+from typing import List, Dict
+
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+class InMemoryResult:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+def _matches(document: Dict, query: Dict) -> bool:
+    """Equality and simple operator ($in, $exists, $gt/$gte/$lt/$lte) matching"""
+    for field, condition in (query or {}).items():
+        value = document.get(field)
+        if isinstance(condition, dict) and condition and all(k.startswith('$') for k in condition):
+            for op, operand in condition.items():
+                if op == '$in' and value not in operand:
+                    return False
+                if op == '$nin' and value in operand:
+                    return False
+                if op == '$exists' and (field in document) != bool(operand):
+                    return False
+                if op == '$ne' and value == operand:
+                    return False
+                if op in ('$gt', '$gte', '$lt', '$lte'):
+                    if value is None:
+                        return False
+                    if op == '$gt' and not value > operand:
+                        return False
+                    if op == '$gte' and not value >= operand:
+                        return False
+                    if op == '$lt' and not value < operand:
+                        return False
+                    if op == '$lte' and not value <= operand:
+                        return False
+        elif value != condition:
+            return False
+    return True
+
+
+def _bson_type(document: Dict, field: str) -> str:
+    if field not in document:
+        return 'missing'
+    value = document[field]
+    for python_type, name in ((type(None), 'null'), (bool, 'bool'), (str, 'string'), (int, 'int'),
+                              (float, 'double'), (list, 'array'), (dict, 'object'), (datetime, 'date')):
+        if isinstance(value, python_type):
+            return name
+    return 'objectId'
+
+
+def _evaluate(document: Dict, expression):
+    """The aggregation expressions DatabaseManager uses: $field paths, $type, $cond, $or, $in, $eq, $not"""
+    if isinstance(expression, str) and expression.startswith('$'):
+        return document.get(expression[1:])
+    if isinstance(expression, list):
+        return [_evaluate(document, item) for item in expression]
+    if not isinstance(expression, dict) or len(expression) != 1:
+        return expression
+    (op, operand), = expression.items()
+    if op == '$type':
+        return _bson_type(document, operand[1:])
+    args = operand if isinstance(operand, list) else [operand]
+    if op == '$cond':
+        return _evaluate(document, args[1] if _evaluate(document, args[0]) else args[2])
+    values = [_evaluate(document, arg) for arg in args]
+    if op == '$or':
+        return any(values)
+    if op == '$in':
+        return values[0] in values[1]
+    if op == '$eq':
+        return values[0] == values[1]
+    if op == '$not':
+        return not values[0]
+    raise NotImplementedError(f"In-memory aggregate does not support {op}")
+
+
+def _group(documents: List[Dict], spec: Dict) -> List[Dict]:
+    groups = {}
+    for document in documents:
+        key = _evaluate(document, spec['_id'])
+        row = groups.setdefault(repr(key), {'_id': key})
+        for field, accumulator in spec.items():
+            if field == '_id':
+                continue
+            if list(accumulator) != ['$sum']:
+                raise NotImplementedError(f"In-memory $group only supports $sum, got {accumulator}")
+            row[field] = row.get(field, 0) + _evaluate(document, accumulator['$sum'])
+    return list(groups.values())
+
+
+def _project(document: Dict, projection: Dict) -> Dict:
+    if not projection:
+        return copy.deepcopy(document)
+    included = [k for k, v in projection.items() if v and k != '_id']
+    if included:
+        result = {k: copy.deepcopy(document[k]) for k in included if k in document}
+        if projection.get('_id', 1) and '_id' in document:
+            result['_id'] = document['_id']
+        return result
+    return {k: copy.deepcopy(v) for k, v in document.items() if projection.get(k, 1)}
+
+
+class InMemoryCursor:
+    def __init__(self, documents: List[Dict]):
+        self._documents = documents
+        self._skip = 0
+        self._limit = 0
+        self._iterator = None
+
+    def sort(self, key, direction: int = 1):
+        keys = key if isinstance(key, list) else [(key, direction)]
+        for field, order in reversed(keys):
+            self._documents.sort(key=lambda d: (d.get(field) is None, d.get(field)), reverse=order < 0)
+        return self
+
+    def skip(self, count: int):
+        self._skip = count
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> Dict:
+        # Single pass, like a pymongo cursor; sort/skip/limit apply until the first read
+        if self._iterator is None:
+            end = self._skip + self._limit if self._limit else None
+            self._iterator = iter(self._documents[self._skip:end])
+        return next(self._iterator)
+
+
+class InMemoryCollection:
+    """Thread-safe subset of pymongo's Collection API used by DatabaseManager and ChatStore.
+
+    Covers find/insert/update/delete, bulk_write of UpdateOne, find_one_and_update
+    ($inc/$set), estimated_document_count and aggregate with $match, $group
+    ($sum only) and $count. Unique indexes are enforced like on a server
+    (DuplicateKeyError / BulkWriteError with code 11000); other indexes are
+    ignored, and $text queries are not supported.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._documents = []
+        self._next_id = 1
+        # Unique key fields -> {key values: document}, '_id' always included
+        self._unique = {('_id',): {}}
+        self._lock = threading.Lock()
+
+    def _prepare(self, document: Dict) -> Dict:
+        document = copy.deepcopy(document)
+        if '_id' not in document:
+            document['_id'] = self._next_id
+            self._next_id += 1
+        return document
+
+    @staticmethod
+    def _key(document: Dict, fields: tuple) -> tuple:
+        return tuple(repr(document.get(field)) for field in fields)
+
+    def _check_unique(self, document: Dict, current: Dict = None):
+        for fields, index in self._unique.items():
+            owner = index.get(self._key(document, fields))
+            if owner is not None and owner is not current:
+                raise DuplicateKeyError(f"E11000 duplicate key error on {fields}", DUPLICATE_KEY_ERROR)
+
+    def _index(self, document: Dict, add: bool = True):
+        for fields, index in self._unique.items():
+            if add:
+                index[self._key(document, fields)] = document
+            else:
+                index.pop(self._key(document, fields), None)
+
+    def _insert(self, document: Dict) -> Dict:
+        document = self._prepare(document)
+        self._check_unique(document)
+        self._documents.append(document)
+        self._index(document)
+        return document
+
+    @staticmethod
+    def _updated(document: Dict, update: Dict) -> Dict:
+        updated = dict(document)
+        updated.update(copy.deepcopy(update.get('$set', {})))
+        for field, amount in update.get('$inc', {}).items():
+            updated[field] = updated.get(field, 0) + amount
+        return updated
+
+    def _first_match(self, query: Dict):
+        # Equality on a unique field is answered from its index instead of a scan
+        if query and len(query) == 1:
+            (field, value), = query.items()
+            index = self._unique.get((field,))
+            if index is not None and not isinstance(value, dict):
+                return index.get((repr(value),))
+        return next((d for d in self._documents if _matches(d, query)), None)
+
+    def _update_one(self, query: Dict, update: Dict, upsert: bool) -> InMemoryResult:
+        document = self._first_match(query)
+        if document is not None:
+            updated = self._updated(document, update)
+            self._check_unique(updated, current=document)
+            changed = updated != document
+            self._index(document, add=False)
+            document.clear()
+            document.update(updated)
+            self._index(document)
+            return InMemoryResult(matched_count=1, modified_count=int(changed), upserted_id=None)
+        if upsert:
+            seed = {k: v for k, v in query.items() if not isinstance(v, dict)}
+            document = self._insert(self._updated(seed, update))
+            return InMemoryResult(matched_count=0, modified_count=0, upserted_id=document['_id'])
+        return InMemoryResult(matched_count=0, modified_count=0, upserted_id=None)
+
+    def find(self, query: Dict = None, projection: Dict = None) -> InMemoryCursor:
+        with self._lock:
+            documents = [_project(d, projection) for d in self._documents if _matches(d, query)]
+        return InMemoryCursor(documents)
+
+    def find_one(self, query: Dict = None, projection: Dict = None):
+        return next(iter(self.find(query, projection)), None)
+
+    def insert_one(self, document: Dict) -> InMemoryResult:
+        with self._lock:
+            document = self._insert(document)
+        return InMemoryResult(inserted_id=document['_id'])
+
+    def insert_many(self, documents: List[Dict], ordered: bool = True) -> InMemoryResult:
+        inserted, errors = [], []
+        with self._lock:
+            for position, document in enumerate(documents):
+                try:
+                    inserted.append(self._insert(document)['_id'])
+                except DuplicateKeyError as e:
+                    errors.append({'index': position, 'code': DUPLICATE_KEY_ERROR, 'errmsg': str(e),
+                                   'op': copy.deepcopy(document)})
+                    if ordered:
+                        break
+        if errors:
+            raise BulkWriteError({'writeErrors': errors, 'nInserted': len(inserted)})
+        return InMemoryResult(inserted_ids=inserted)
+
+    def update_one(self, query: Dict, update: Dict, upsert: bool = False) -> InMemoryResult:
+        with self._lock:
+            return self._update_one(query, update, upsert)
+
+    def bulk_write(self, operations: List, ordered: bool = True) -> InMemoryResult:
+        """UpdateOne operations only, which is all DatabaseManager sends"""
+        totals = {'matched_count': 0, 'modified_count': 0, 'upserted_count': 0}
+        errors = []
+        with self._lock:
+            for position, operation in enumerate(operations):
+                try:
+                    result = self._update_one(operation._filter, operation._doc, operation._upsert)
+                except DuplicateKeyError as e:
+                    errors.append({'index': position, 'code': DUPLICATE_KEY_ERROR, 'errmsg': str(e)})
+                    if ordered:
+                        break
+                    continue
+                totals['matched_count'] += result.matched_count
+                totals['modified_count'] += result.modified_count
+                totals['upserted_count'] += result.upserted_id is not None
+        if errors:
+            raise BulkWriteError({'writeErrors': errors, 'nMatched': totals['matched_count'],
+                                  'nModified': totals['modified_count'], 'nUpserted': totals['upserted_count']})
+        return InMemoryResult(**totals)
+
+    def find_one_and_update(self, query: Dict, update: Dict, upsert: bool = False,
+                            return_document=ReturnDocument.BEFORE):
+        with self._lock:
+            before = copy.deepcopy(self._first_match(query))
+            self._update_one(query, update, upsert)
+            if return_document == ReturnDocument.BEFORE:
+                return before
+            return copy.deepcopy(self._first_match(query))
+
+    def delete_many(self, query: Dict) -> InMemoryResult:
+        with self._lock:
+            kept = []
+            for document in self._documents:
+                if _matches(document, query):
+                    self._index(document, add=False)
+                else:
+                    kept.append(document)
+            deleted = len(self._documents) - len(kept)
+            self._documents = kept
+        return InMemoryResult(deleted_count=deleted)
+
+    def count_documents(self, query: Dict) -> int:
+        with self._lock:
+            return sum(1 for d in self._documents if _matches(d, query))
+
+    def estimated_document_count(self) -> int:
+        with self._lock:
+            return len(self._documents)
+
+    def aggregate(self, pipeline: List[Dict], **kwargs) -> InMemoryCursor:
+        with self._lock:
+            documents = [copy.deepcopy(d) for d in self._documents]
+        for stage in pipeline:
+            (name, spec), = stage.items()
+            if name == '$match':
+                documents = [d for d in documents if _matches(d, spec)]
+            elif name == '$group':
+                documents = _group(documents, spec)
+            elif name == '$count':
+                documents = [{spec: len(documents)}] if documents else []
+            else:
+                raise NotImplementedError(f"In-memory aggregate does not support {name}")
+        return InMemoryCursor(documents)
+
+    def create_index(self, keys, unique: bool = False, **kwargs) -> str:
+        # Only unique indexes change behaviour; the rest only affect performance on a real server
+        if unique:
+            fields = tuple(field for field, _ in keys) if isinstance(keys, list) else (keys,)
+            with self._lock:
+                index = {}
+                for document in self._documents:
+                    key = self._key(document, fields)
+                    if key in index:
+                        raise OperationFailure(f"E11000 duplicate key error building unique index on {fields}",
+                                               DUPLICATE_KEY_ERROR)
+                    index[key] = document
+                self._unique[fields] = index
+        return kwargs.get('name') or str(keys)
+
+
+class InMemoryDatabase:
+    def __init__(self):
+        self._collections = {}
+
+    def __getitem__(self, name: str) -> InMemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = InMemoryCollection(name)
+        return self._collections[name]
+
+    def __getattr__(self, name: str) -> InMemoryCollection:
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
+
+    def list_collection_names(self) -> List[str]:
+        return list(self._collections)
+
+
+class InMemoryAdmin:
+    def command(self, name: str, *args, **kwargs) -> Dict:
+        return {'ok': 1.0}
+
+
+class InMemoryMongoClient:
+    """In-process MongoClient stand-in for offline load tests and benchmarks"""
+
+    def __init__(self, *args, **kwargs):
+        self._databases = {}
+        self.admin = InMemoryAdmin()
+
+    def __getitem__(self, name: str) -> InMemoryDatabase:
+        if name not in self._databases:
+            self._databases[name] = InMemoryDatabase()
+        return self._databases[name]
+
+    def server_info(self) -> Dict:
+        return {'version': 'in-memory'}
@@ -0,0 +1,179 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import List, Dict
+
+import pandas as pd
+
+from database import DatabaseManager
+from title_hashes import SeenHashes, hash_titles
+
+DEFAULT_CHUNK_SIZE = 5000
+DEFAULT_WORKERS = 4
+REQUIRED_COLUMNS = ['book_name', 'summaries', 'categories']
+
+
+def clean_chunk(df: pd.DataFrame) -> List[Dict]:
+    """Apply the migration clean-up to one CSV chunk"""
+    df = df.drop(columns=[c for c in df.columns if c.startswith('Unnamed:')])
+    df = df.dropna(subset=['book_name'])
+    df['book_name'] = df['book_name'].astype(str).str.strip()
+    df = df[df['book_name'] != '']
+    # Within a chunk the first row wins; ingest_csv skips titles seen in earlier chunks
+    df = df.drop_duplicates(subset=['book_name'], keep='first')
+    df = df.astype(object).where(df.notna(), None)
+    return df.to_dict('records')
+
+
+class IngestCheckpoint:
+    """Tracks the contiguous prefix of chunks already written for one CSV file.
+
+    Upserts are idempotent, so resuming only needs the first chunk that is not
+    known to be complete; chunks finished out of order are simply rewritten.
+    """
+
+    def __init__(self, path: str, csv_path: str, chunk_size: int):
+        self.path = path
+        stat = os.stat(csv_path)
+        self.source = {
+            'csv_path': os.path.abspath(csv_path),
+            'csv_size': stat.st_size,
+            'csv_mtime': stat.st_mtime,
+            'chunk_size': chunk_size
+        }
+        self.next_chunk = 0
+        self.rows_done = 0
+        self._finished = {}
+
+    def load(self) -> bool:
+        """Resume from an existing checkpoint if it belongs to the same file and chunk size"""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Ignoring unreadable checkpoint: {str(e)}")
+            return False
+        if state.get('source') != self.source:
+            print("Checkpoint belongs to a different CSV or chunk size, starting over")
+            return False
+        self.next_chunk = state['next_chunk']
+        self.rows_done = state['rows_done']
+        return True
+
+    def mark_done(self, chunk_index: int, rows: int):
+        self._finished[chunk_index] = rows
+        advanced = False
+        while self.next_chunk in self._finished:
+            self.rows_done += self._finished.pop(self.next_chunk)
+            self.next_chunk += 1
+            advanced = True
+        if advanced:
+            self._save()
+
+    def _save(self):
+        state = {'source': self.source, 'next_chunk': self.next_chunk, 'rows_done': self.rows_done}
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def ingest_csv(csv_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE, workers: int = DEFAULT_WORKERS,
+               checkpoint_path: str = None, resume: bool = True, db_manager: DatabaseManager = None) -> bool:
+    """Stream a CSV into MongoDB with parallel unordered bulk upserts.
+
+    At most workers * 2 chunks are held in memory at once. When a title repeats
+    the first CSV row wins, as in sync_catalog: titles already seen in earlier
+    chunks are skipped, tracked as 64-bit hashes (8 bytes per distinct title,
+    see SeenHashes). Returns
+    False if any chunk failed; rerun to resume from the last checkpoint.
+    """
+    checkpoint_path = checkpoint_path or csv_path + '.ingest.json'
+    checkpoint = IngestCheckpoint(checkpoint_path, csv_path, chunk_size)
+    if resume and checkpoint.load():
+        print(f"Resuming at chunk {checkpoint.next_chunk} ({checkpoint.rows_done} rows already written)")
+
+    db_manager = db_manager or DatabaseManager()
+    # Upserts match on book_name, so make sure its index exists before the first chunk
+    db_manager.ensure_indexes()
+    start_time = time.perf_counter()
+    resumed_rows = checkpoint.rows_done
+    rows_written = 0
+    failed_chunks = []
+    in_flight = {}
+    seen_titles = SeenHashes()
+
+    def report_progress():
+        elapsed = time.perf_counter() - start_time
+        rate = rows_written / elapsed if elapsed else 0.0
+        print(f"Progress: {resumed_rows + rows_written} rows | "
+              f"{rate:,.0f} rows/s | {elapsed:.1f}s elapsed")
+
+    def collect(done_futures):
+        nonlocal rows_written
+        for future in done_futures:
+            chunk_index, rows = in_flight.pop(future)
+            if future.result() is None:
+                failed_chunks.append(chunk_index)
+                continue
+            rows_written += rows
+            checkpoint.mark_done(chunk_index, rows)
+            report_progress()
+
+    reader = pd.read_csv(csv_path, chunksize=chunk_size)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for chunk_index, df in enumerate(reader):
+            missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
+            if missing:
+                print(f"CSV is missing required columns: {missing}")
+                return False
+            books = clean_chunk(df)
+            new = seen_titles.add_new(hash_titles([book['book_name'] for book in books]))
+            books = [book for book, is_new in zip(books, new) if is_new]
+            if chunk_index < checkpoint.next_chunk:
+                # Already written; read only so later duplicates of its titles stay skipped
+                continue
+            future = executor.submit(db_manager.upsert_many_books, books)
+            in_flight[future] = (chunk_index, len(books))
+            # Back-pressure keeps the number of parsed chunks in memory bounded
+            if len(in_flight) >= workers * 2:
+                done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                collect(done)
+            if failed_chunks:
+                break
+        collect(wait(list(in_flight)).done)
+
+    elapsed = time.perf_counter() - start_time
+    if failed_chunks:
+        print(f"Ingestion stopped: chunks {sorted(failed_chunks)} failed. "
+              f"Rerun to resume from chunk {checkpoint.next_chunk}")
+        return False
+
+    print(f"Ingested {rows_written} rows in {elapsed:.1f}s "
+          f"({rows_written / elapsed if elapsed else 0:,.0f} rows/s)")
+    checkpoint.clear()
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream a books CSV into MongoDB")
+    parser.add_argument('csv_path')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--checkpoint', help="Checkpoint file (default: <csv_path>.ingest.json)")
+    parser.add_argument('--restart', action='store_true', help="Ignore any existing checkpoint")
+    args = parser.parse_args()
+
+    ingest_csv(args.csv_path, args.chunk_size, args.workers, args.checkpoint, resume=not args.restart)
+
+
+if __name__ == "__main__":
+    main()
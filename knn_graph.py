@@ -0,0 +1,123 @@
+import argparse
+import hashlib
+import logging
+import time
+from typing import List, Dict, Optional
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NEIGHBORS = 20
+
+
+def catalog_fingerprint(books_data: List[Dict], encoder: str) -> str:
+    """Hash of the encoder signature and the cleaned catalog in index order.
+
+    Row ids are only valid for the same catalog, and neighbours only for the
+    same encoder (see encoders.encoder_signature).
+    """
+    digest = hashlib.sha1()
+    digest.update(encoder.encode('utf-8'))
+    digest.update(b'\x02')
+    for book in books_data:
+        digest.update(book['book_name'].encode('utf-8'))
+        digest.update(b'\x00')
+        digest.update(book['summaries'].encode('utf-8'))
+        digest.update(b'\x01')
+    return digest.hexdigest()
+
+
+class KnnGraph:
+    """Precomputed top-N neighbours per book, as row ids into the catalog.
+
+    neighbors is an int32 (books, N) array sorted best first and padded with -1;
+    scores holds the matching similarity scores as float16.
+    """
+
+    def __init__(self, neighbors: np.ndarray, scores: np.ndarray, fingerprint: str):
+        self.neighbors = neighbors
+        self.scores = scores
+        self.fingerprint = fingerprint
+
+    @property
+    def width(self) -> int:
+        return self.neighbors.shape[1]
+
+    def save(self, path: str):
+        np.savez(path, neighbors=self.neighbors, scores=self.scores, fingerprint=np.array(self.fingerprint))
+
+    @classmethod
+    def load(cls, path: str) -> 'KnnGraph':
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data['neighbors'], data['scores'], str(data['fingerprint']))
+
+
+def build_knn_graph(embeddings: np.ndarray, fingerprint: str, num_neighbors: int = DEFAULT_NEIGHBORS,
+                    batch_size: int = 4096) -> KnnGraph:
+    """Exact top-N neighbours of every book, excluding the book itself"""
+    embeddings = np.ascontiguousarray(embeddings, dtype='float32')
+    index = faiss.IndexFlatL2(embeddings.shape[1])
+    index.add(embeddings)
+
+    total = len(embeddings)
+    neighbors = np.full((total, num_neighbors), -1, dtype='int32')
+    scores = np.zeros((total, num_neighbors), dtype='float16')
+    # One extra hit per row, since each book finds itself first
+    k = min(num_neighbors + 1, total)
+    for start in range(0, total, batch_size):
+        distances, ids = index.search(embeddings[start:start + batch_size], k)
+        for offset, (row_ids, row_distances) in enumerate(zip(ids, distances)):
+            row = start + offset
+            keep = (row_ids != row) & (row_ids >= 0)
+            row_ids = row_ids[keep][:num_neighbors]
+            neighbors[row, :len(row_ids)] = row_ids
+            scores[row, :len(row_ids)] = 1 / (1 + row_distances[keep][:num_neighbors])
+    return KnnGraph(neighbors, scores, fingerprint)
+
+
+def load_knn_graph(path: str, books_data: List[Dict], encoder: str) -> Optional[KnnGraph]:
+    """Load the graph for this catalog and encoder, or None if the file is missing or built for others"""
+    try:
+        graph = KnnGraph.load(path)
+    except FileNotFoundError:
+        logger.info(f"No kNN graph at {path}, more-like-this will search the index")
+        return None
+    except Exception as e:
+        logger.warning(f"Could not read kNN graph {path}: {str(e)}")
+        return None
+    if graph.fingerprint != catalog_fingerprint(books_data, encoder) or len(graph.neighbors) != len(books_data):
+        logger.warning(f"kNN graph {path} was built for a different catalog or encoder, ignoring it")
+        return None
+    return graph
+
+
+def main():
+    from database import DatabaseManager
+    from encoders import create_encoder, encoder_signature
+    from recommender import ContextAwareBookRecommender
+
+    parser = argparse.ArgumentParser(description="Precompute the top-N similar books for every book")
+    parser.add_argument('--output', default='book_neighbors.npz')
+    parser.add_argument('--neighbors', type=int, default=DEFAULT_NEIGHBORS)
+    args = parser.parse_args()
+
+    # Same cleaning and order as the recommender, so row ids and the fingerprint line up
+    books = ContextAwareBookRecommender.clean_book_data(DatabaseManager().get_all_books())
+    if not books:
+        raise SystemExit("No books found in database")
+
+    start = time.perf_counter()
+    encoder = create_encoder()
+    embeddings = encoder.encode([book['summaries'] for book in books]).astype('float32')
+    print(f"Encoded {len(books)} books in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    graph = build_knn_graph(embeddings, catalog_fingerprint(books, encoder_signature(encoder)), args.neighbors)
+    graph.save(args.output)
+    print(f"Wrote {graph.neighbors.shape} neighbours to {args.output} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
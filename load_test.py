@@ -0,0 +1,204 @@
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import List, Dict
+
+import numpy as np
+
+from in_memory_mongo import InMemoryMongoClient
+from synthetic_data import generate_books, FakeEncoder, StubGeminiModel
+from traffic import load_traffic
+
+
+def build_offline_app(catalog_size: int, gemini_latency: float, gemini_jitter: float,
+                      gemini_failure_rate: float, encoder: str = 'fake'):
+    """Import app.py with Mongo, Gemini and (optionally) the encoder replaced in-process"""
+    import database
+    import recommender
+    import google.generativeai as genai
+
+    os.environ.setdefault('GOOGLE_API_KEY', 'offline-load-test')
+    os.environ.setdefault('MONGODB_URI', 'mongodb://in-memory')
+    # The in-memory collections start empty, so the app creates the indexes it relies on
+    os.environ.setdefault('ENSURE_MONGODB_INDEXES', '1')
+
+    client = InMemoryMongoClient()
+    client['book_recommender']['books'].insert_many(generate_books(catalog_size))
+    gemini = StubGeminiModel(latency=gemini_latency, jitter=gemini_jitter)
+
+    database.MongoClient = lambda *args, **kwargs: client
+    # The in-memory catalog is rebuilt every run, so its snapshot goes to a throwaway directory
+    database.CATALOG_SNAPSHOT_PATH = os.path.join(tempfile.mkdtemp(prefix='load-test-'), 'catalog_snapshot.npz')
+    genai.GenerativeModel = lambda *args, **kwargs: gemini
+    if encoder == 'fake':
+        fake_encoder = FakeEncoder()
+        recommender.create_encoder = lambda *args, **kwargs: fake_encoder
+
+    import app as app_module
+    # Enable failures only after startup so the connection test in __init__ passes
+    gemini.failure_rate = gemini_failure_rate
+    return app_module.app
+
+
+class InProcessSender:
+    """Sends requests through Flask's test client, one client per worker thread"""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self._local = threading.local()
+
+    def send(self, path: str, payload: Dict) -> int:
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.flask_app.test_client()
+        return client.post(path, json=payload).status_code
+
+
+class HttpSender:
+    """Sends requests to a running server, e.g. a staging deploy"""
+
+    def __init__(self, base_url: str, timeout: float = 60.0):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def send(self, path: str, payload: Dict) -> int:
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=json.dumps(payload).encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+def replay(records: List[Dict], sender, concurrency: int, rate: float = None) -> List[Dict]:
+    """Replay records closed-loop at a fixed concurrency, or open-loop at a fixed rate"""
+    from recommender import ContextAwareBookRecommender
+    results = []
+    results_lock = threading.Lock()
+
+    def run_one(record: Dict):
+        payload = {'query': record['query']}
+        if record.get('chat_id'):
+            payload['chat_id'] = record['chat_id']
+        start = time.perf_counter()
+        try:
+            status = sender.send(record['path'], payload)
+            error = None
+        except Exception as e:
+            status = None
+            error = str(e)
+        latency = time.perf_counter() - start
+        with results_lock:
+            results.append({
+                'request_id': record['request_id'],
+                'intent': ContextAwareBookRecommender.check_if_allowed_query(record['query']),
+                'status': status,
+                'error': error,
+                'latency': latency
+            })
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        start = time.perf_counter()
+        for i, record in enumerate(records):
+            if rate:
+                # Open loop: schedule sends on a fixed clock regardless of response times
+                delay = start + i / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            executor.submit(run_one, record)
+    return results
+
+
+def summarize(results: List[Dict], elapsed: float) -> Dict:
+    def stats(group: List[Dict]) -> Dict:
+        latencies_ms = np.array([r['latency'] for r in group]) * 1000
+        errors = sum(1 for r in group if r['error'] or r['status'] is None or r['status'] >= 400)
+        return {
+            'requests': len(group),
+            'errors': errors,
+            'error_rate': round(errors / len(group), 4),
+            'latency_p50_ms': round(float(np.percentile(latencies_ms, 50)), 2),
+            'latency_p90_ms': round(float(np.percentile(latencies_ms, 90)), 2),
+            'latency_p99_ms': round(float(np.percentile(latencies_ms, 99)), 2),
+            'latency_mean_ms': round(float(latencies_ms.mean()), 2)
+        }
+
+    by_intent = {}
+    for result in results:
+        by_intent.setdefault(result['intent'], []).append(result)
+
+    return {
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput_rps': round(len(results) / elapsed, 2) if elapsed else None,
+        'overall': stats(results) if results else {},
+        'by_intent': {intent: stats(group) for intent, group in sorted(by_intent.items())}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded traffic against the Flask app")
+    parser.add_argument('traffic', help="JSONL traffic file (requests.jsonl format)")
+    parser.add_argument('--url', help="Replay against a running server instead of an in-process app")
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--rate', type=float, help="Requests per second (open loop); default is closed loop")
+    parser.add_argument('--repeat', type=int, default=1, help="Replay the traffic file this many times")
+    parser.add_argument('--catalog-size', type=int, default=10_000)
+    parser.add_argument('--encoder', choices=['fake', 'real'], default='fake')
+    parser.add_argument('--gemini-latency', type=float, default=0.5, help="Stub Gemini latency in seconds")
+    parser.add_argument('--gemini-jitter', type=float, default=0.2)
+    parser.add_argument('--gemini-failure-rate', type=float, default=0.0)
+    parser.add_argument('--output', help="Write the JSON report here")
+    args = parser.parse_args()
+
+    records = load_traffic(args.traffic) * args.repeat
+    if not records:
+        print("No replayable records found")
+        return
+    print(f"Loaded {len(records)} requests from {args.traffic}")
+
+    if args.url:
+        sender = HttpSender(args.url)
+    else:
+        sender = InProcessSender(build_offline_app(
+            args.catalog_size, args.gemini_latency, args.gemini_jitter,
+            args.gemini_failure_rate, args.encoder
+        ))
+
+    start = time.perf_counter()
+    results = replay(records, sender, args.concurrency, args.rate)
+    report = summarize(results, time.perf_counter() - start)
+    report.update({
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'traffic': args.traffic,
+        'target': args.url or 'in-process',
+        'concurrency': args.concurrency,
+        'rate': args.rate
+    })
+
+    print(f"\nThroughput: {report['throughput_rps']} req/s over {report['elapsed_seconds']}s")
+    for intent, intent_stats in report['by_intent'].items():
+        print(f"- {intent}: {intent_stats['requests']} req | "
+              f"p50 {intent_stats['latency_p50_ms']}ms | p99 {intent_stats['latency_p99_ms']}ms | "
+              f"errors {intent_stats['error_rate']:.2%}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
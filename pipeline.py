@@ -0,0 +1,118 @@
+import os
+import time
+import uuid
+from typing import Dict, Optional
+
+from recommender import ContextAwareBookRecommender
+from response_cache import ResponseCache
+from session_vectors import SessionVectorCache
+
+# Books shown per page and how deep the ranked list cached for "show more" goes
+PAGE_SIZE = 4
+RANKED_LIST_DEPTH = int(os.getenv("RANKED_LIST_DEPTH", "40"))
+RANKED_LIST_SESSIONS = int(os.getenv("RANKED_LIST_SESSIONS", "1000"))
+RANKED_LIST_TTL = float(os.getenv("RANKED_LIST_TTL", "1800"))
+# Books handed to the LLM, as before pagination
+GENERATION_BOOKS = 5
+
+# Stages each intent actually needs; greetings, thanks, farewells and invalid
+# queries get a canned reply and never touch the encoder, index, LLM or history
+STAGES_BY_INTENT = {
+    'book': ('context', 'encode', 'blend', 'search', 'generate', 'history'),
+    'greeting': ('generate',),
+    'gratitude': ('generate',),
+    'farewell': ('generate',),
+    'invalid': ('generate',)
+}
+
+
+class RequestPipeline:
+    """Classify first, then run only the stages the query's intent needs.
+
+    Every stage that runs is timed; run() returns the timings in milliseconds
+    alongside the response so callers can log or aggregate them, plus the
+    size of the LLM prompt when one was built (empty otherwise).
+
+    When a session id is given, a book query is ranked ranked_list_depth deep
+    once and the list is cached for that session; next_page() then serves
+    further pages from it with no encode or search. A session only keeps its
+    latest list, so cursors from an earlier query stop working.
+
+    The session id also keys the recent query vectors that follow-up queries
+    are blended with before search (see SessionVectorCache); without one,
+    every query is searched on its own.
+    """
+
+    def __init__(self, recommender: ContextAwareBookRecommender, max_recommendations: int = PAGE_SIZE,
+                 ranked_list_depth: int = RANKED_LIST_DEPTH, ranked_list_sessions: int = RANKED_LIST_SESSIONS):
+        self.recommender = recommender
+        self.max_recommendations = max_recommendations
+        self.ranked_list_depth = ranked_list_depth
+        # Cached books are the search result dicts, which share their strings with the catalog
+        self.ranked_lists = ResponseCache(ranked_list_sessions, RANKED_LIST_TTL)
+        self.session_vectors = SessionVectorCache()
+
+    def run(self, query: str, session_id: Optional[str] = None) -> Dict:
+        timings = {}
+
+        def timed(stage, fn, *args, **kwargs):
+            start = time.perf_counter()
+            result = fn(*args, **kwargs)
+            timings[stage] = round((time.perf_counter() - start) * 1000, 3)
+            return result
+
+        intent = timed('classify', self.recommender.check_if_allowed_query, query)
+        stages = STAGES_BY_INTENT.get(intent, ('generate',))
+
+        context = timed('context', self.recommender.get_context) if 'context' in stages else ""
+        # Search, prompt and title highlighting all use the catalog generation live now
+        generation = self.recommender.generation
+        similar_books = []
+        if 'encode' in stages:
+            depth = max(self.ranked_list_depth, GENERATION_BOOKS) if session_id else GENERATION_BOOKS
+            query_vector = timed('encode', self.recommender.encode_query, query)
+            if session_id and 'blend' in stages:
+                query_vector = timed('blend', self.session_vectors.blend, session_id, query_vector)
+            similar_books = timed('search', self.recommender.search_similar, query_vector, depth,
+                                  generation=generation)
+
+        prompt_stats = {}
+        response = timed('generate', self.recommender.generate_response,
+                         query, similar_books[:GENERATION_BOOKS], context, query_type=intent,
+                         prompt_stats=prompt_stats, generation=generation)
+
+        if 'history' in stages:
+            timed('history', self.recommender.update_conversation_history, query, response)
+
+        next_cursor = None
+        if session_id and len(similar_books) > self.max_recommendations:
+            next_cursor = self._cache_ranked_list(session_id, similar_books)
+
+        timings['total'] = round(sum(timings.values()), 3)
+        return {
+            'intent': intent,
+            'response': response,
+            'recommendations': similar_books[:self.max_recommendations],
+            'next_cursor': next_cursor,
+            'timings': timings,
+            'prompt': prompt_stats
+        }
+
+    def _cache_ranked_list(self, session_id: str, books) -> str:
+        token = uuid.uuid4().hex[:12]
+        self.ranked_lists.put(session_id, (token, books))
+        return f"{token}:{self.max_recommendations}"
+
+    def next_page(self, session_id: str, cursor: str, limit: int = None) -> Optional[Dict]:
+        """Next page of a cached ranked list; None if the cursor is unknown, stale or expired"""
+        token, _, offset = cursor.partition(':')
+        entry = self.ranked_lists.get(session_id)
+        if entry is None or entry[0] != token or not offset.isdigit():
+            return None
+        books = entry[1]
+        start = int(offset)
+        end = start + (limit or self.max_recommendations)
+        return {
+            'recommendations': books[start:end],
+            'next_cursor': f"{token}:{end}" if end < len(books) else None
+        }
@@ -0,0 +1,94 @@
+import math
+import os
+from typing import List, Dict, Tuple
+
+# Per-book and per-request limits, in estimated tokens
+DEFAULT_SUMMARY_TOKENS = int(os.getenv("PROMPT_SUMMARY_TOKENS", "120"))
+DEFAULT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "700"))
+# Below this many spare tokens a book is dropped rather than squeezed further
+MIN_FRAGMENT_TOKENS = 40
+CHARS_PER_TOKEN = 4
+BOOK_SEPARATOR = "---\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text at a word boundary so it fits roughly max_tokens"""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars - 1].rsplit(' ', 1)[0].rstrip(' ,;:.')
+    return cut + '…'
+
+
+class PromptBuilder:
+    """Builds the book section of the recommendation prompt within a token budget.
+
+    Each book's fragment (title, category, trimmed summary) is formatted once
+    when the catalog is indexed. Per request the ranked fragments are appended
+    until the budget runs out; the first book that does not fit is truncated if
+    enough room is left, and it and all lower-ranked books are dropped otherwise.
+    The rank-1 book is always kept (truncated to MIN_FRAGMENT_TOKENS of summary
+    if need be), so the prompt never asks for picks from an empty list.
+    """
+
+    def __init__(self, books_data: List[Dict], max_summary_tokens: int = DEFAULT_SUMMARY_TOKENS,
+                 token_budget: int = DEFAULT_TOKEN_BUDGET):
+        self.max_summary_tokens = max_summary_tokens
+        self.token_budget = token_budget
+        self.fragments = {}
+        for book in books_data:
+            fragment = self.format_fragment(book['book_name'], book['categories'], book['summaries'],
+                                            max_summary_tokens)
+            self.fragments[book['book_name']] = (fragment, estimate_tokens(fragment))
+
+    @staticmethod
+    def format_fragment(title: str, category: str, summary: str, max_summary_tokens: int) -> str:
+        return (f"Title: {title}\n"
+                f"Category: {category}\n"
+                f"Summary: {truncate_to_tokens(summary, max_summary_tokens)}\n")
+
+    def build_book_block(self, books: List[Dict]) -> Tuple[str, Dict]:
+        """Numbered book list for the prompt plus size stats for this request"""
+        stats = {'books_included': 0, 'books_truncated': 0, 'books_dropped': 0, 'book_tokens': 0}
+        if not books:
+            return "No matching books found.", stats
+
+        header = "AVAILABLE BOOKS FOR RECOMMENDATION:\n\n"
+        parts = [header]
+        used = estimate_tokens(header)
+        for rank, book in enumerate(books, 1):
+            label = f"Book #{rank}:\n"
+            overhead = estimate_tokens(label + BOOK_SEPARATOR)
+            fragment, tokens = self.fragments.get(book['title']) or self._fragment_for(book)
+            remaining = self.token_budget - used - overhead
+            if tokens > remaining:
+                summary_room = remaining - (tokens - self._summary_tokens(fragment))
+                if summary_room < MIN_FRAGMENT_TOKENS:
+                    if rank > 1:
+                        stats['books_dropped'] = len(books) - rank + 1
+                        break
+                    summary_room = MIN_FRAGMENT_TOKENS
+                fragment = self.format_fragment(book['title'], book['category'], book['summary'], summary_room)
+                tokens = estimate_tokens(fragment)
+                stats['books_truncated'] += 1
+            parts.append(label + fragment + BOOK_SEPARATOR)
+            used += overhead + tokens
+            stats['books_included'] += 1
+
+        block = ''.join(parts)
+        stats['book_tokens'] = estimate_tokens(block)
+        return block, stats
+
+    def _fragment_for(self, book: Dict) -> Tuple[str, int]:
+        # Books outside the indexed catalog are formatted on the fly
+        fragment = self.format_fragment(book['title'], book['category'], book['summary'], self.max_summary_tokens)
+        return fragment, estimate_tokens(fragment)
+
+    @staticmethod
+    def _summary_tokens(fragment: str) -> int:
+        return estimate_tokens(fragment.split("Summary: ", 1)[-1])
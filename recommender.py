@@ -1,40 +1,134 @@
 import pandas as pd
 import numpy as np
-from sentence_transformers import SentenceTransformer
 import faiss
 import google.generativeai as genai
-from typing import List, Dict
+from encoders import create_encoder, encoder_signature
+from knn_graph import KnnGraph, load_knn_graph
+from title_matcher import TitleMatcher
+from prompt_builder import PromptBuilder, DEFAULT_SUMMARY_TOKENS, DEFAULT_TOKEN_BUDGET, estimate_tokens
+from response_cache import ResponseCache
+from sharded_search import ShardedIndex
+from typing import List, Dict, Callable, Optional
 import re
 import random
 import logging
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FuturesTimeoutError
 
 # Add at the top of the file
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Upper bound on time spent waiting for Gemini per request, in seconds
+DEFAULT_LLM_DEADLINE = float(os.getenv("LLM_DEADLINE_SECONDS", "6"))
+LLM_MAX_WORKERS = int(os.getenv("LLM_MAX_WORKERS", "8"))
+# Gemini calls are cut off this long after the deadline, so a hung call cannot hold a worker forever;
+# the margin lets a slightly late answer still warm the response cache
+LLM_TIMEOUT_MARGIN = float(os.getenv("LLM_TIMEOUT_MARGIN_SECONDS", "4"))
+# Conversation summaries run on their own pool so they never queue ahead of recommendations
+SUMMARY_MAX_WORKERS = int(os.getenv("SUMMARY_MAX_WORKERS", "2"))
+# Generated responses kept for repeated queries; 0 disables the cache
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "600"))
+# Optional precomputed neighbour file from knn_graph.py for "more like this"
+KNN_GRAPH_PATH = os.getenv("KNN_GRAPH_PATH")
+
+# Placeholders are filled with str.format, which leaves braces in the values untouched
+RECOMMENDATION_PROMPT = """
+You are a book recommender. ONLY recommend books from the following list. DO NOT mention or suggest any books not in this list:
+
+{book_block}
+
+For the query "{query}", create a response following these STRICT rules:
+1. Start with a brief greeting
+2. ONLY recommend books from the above list
+3. For each recommended book, include:
+   - Exact title as shown above
+   - Category as shown above
+   - Brief description using ONLY the provided summary
+4. Use conversational language
+5. End with a question about their reading preferences
+
+IMPORTANT:
+- NEVER mention or suggest books not in the provided list
+- Use EXACT titles and categories as shown
+- Base descriptions ONLY on the provided summaries
+"""
+
+class CatalogGeneration:
+    """One immutable snapshot of the catalog and everything derived from it"""
+
+    def __init__(self, number: int, books_data: List[Dict], embeddings: np.ndarray, index,
+                 title_matcher: TitleMatcher, prompt_builder: PromptBuilder, knn_graph: Optional[KnnGraph] = None):
+        self.number = number
+        self.books_data = books_data
+        # None when the vectors live only in a remote (sharded) index
+        self.embeddings = embeddings
+        self.index = index
+        self.title_matcher = title_matcher
+        self.prompt_builder = prompt_builder
+        self.knn_graph = knn_graph
+        # Row id of each title (first occurrence), for lookups by title
+        self.title_rows = {}
+        for row, book in enumerate(books_data):
+            self.title_rows.setdefault(book['book_name'], row)
+
 class ContextAwareBookRecommender:
-    def __init__(self, books_data: List[Dict]):
+    def __init__(self, books_data: List[Dict], model=None, gemini_model=None,
+                 hallucination_mode: str = 'flag', prompt_token_budget: int = DEFAULT_TOKEN_BUDGET,
+                 max_summary_tokens: int = DEFAULT_SUMMARY_TOKENS, llm_deadline: float = DEFAULT_LLM_DEADLINE,
+                 response_cache_size: int = RESPONSE_CACHE_SIZE,
+                 index_factory: Callable[[int], object] = faiss.IndexFlatL2,
+                 knn_graph_path: Optional[str] = KNN_GRAPH_PATH):
+        # model: any encoder with encode(List[str]) -> np.ndarray, defaults to MiniLM
+        # gemini_model: pre-built generative model, skips the API key check and test call
+        # hallucination_mode: 'flag' logs catalog titles the LLM adds on its own, 'strip' also removes them
+        # prompt_token_budget / max_summary_tokens: size limits for the book list sent to Gemini
+        # llm_deadline: seconds to wait for Gemini before answering with the fallback response
+        # index_factory: builds an empty index for a dimension, e.g. LocalShardCluster.index_factory
+        # knn_graph_path: precomputed neighbours from knn_graph.py, used when built for this catalog
         try:
-            self.model = SentenceTransformer('paraphrase-MiniLM-L6-v2')
-            self.books_data = self.clean_book_data(books_data)
-            self.embeddings = None
-            self.index = None
-            logger.info("Initializing embeddings for database...")
-            self.initialize_embeddings()
+            self.model = model if model is not None else create_encoder()
+            self.hallucination_mode = hallucination_mode
+            self.prompt_token_budget = prompt_token_budget
+            self.max_summary_tokens = max_summary_tokens
+            self.index_factory = index_factory
+            self.knn_graph_path = knn_graph_path
             
-            # Verify API key before initializing Gemini
-            api_key = os.getenv("GOOGLE_API_KEY")
-            if not api_key:
-                raise ValueError("GOOGLE_API_KEY not found in environment variables")
+            # Everything derived from the catalog lives in one generation that reloads swap out
+            self._reload_lock = threading.Lock()
+            self.reload_status = {'state': 'idle', 'generation': 0, 'books': 0,
+                                  'last_duration': None, 'last_error': None}
+            logger.info("Initializing embeddings for database...")
+            self._generation = self.build_generation(books_data, number=1)
+            self.reload_status.update(generation=1, books=len(self._generation.books_data))
             
-            genai.configure(api_key=api_key)
-            self.gemini_model = genai.GenerativeModel('gemini-pro')
+            if gemini_model is not None:
+                self.gemini_model = gemini_model
+            else:
+                # Verify API key before initializing Gemini
+                api_key = os.getenv("GOOGLE_API_KEY")
+                if not api_key:
+                    raise ValueError("GOOGLE_API_KEY not found in environment variables")
+                
+                genai.configure(api_key=api_key)
+                self.gemini_model = genai.GenerativeModel('gemini-pro')
+                
+                # Test API connection
+                test_response = self.gemini_model.generate_content("Test connection")
+                if not test_response:
+                    raise ValueError("Failed to connect to Gemini API")
             
-            # Test API connection
-            test_response = self.gemini_model.generate_content("Test connection")
-            if not test_response:
-                raise ValueError("Failed to connect to Gemini API")
+            # Gemini calls run on a pool so a slow answer cannot hold the request past its deadline
+            self.llm_deadline = llm_deadline
+            self.llm_request_options = {'timeout': llm_deadline + LLM_TIMEOUT_MARGIN}
+            self._llm_executor = ThreadPoolExecutor(max_workers=LLM_MAX_WORKERS, thread_name_prefix='gemini')
+            self._summary_executor = ThreadPoolExecutor(max_workers=SUMMARY_MAX_WORKERS,
+                                                        thread_name_prefix='gemini-summary')
+            self.response_cache = (ResponseCache(response_cache_size, RESPONSE_CACHE_TTL)
+                                   if response_cache_size > 0 else None)
             
             self.conversation_history = []
             self.conversation_summaries = []
@@ -43,7 +137,8 @@ class ContextAwareBookRecommender:
             logger.error(f"Error initializing recommender: {str(e)}")
             raise
 
-    def clean_book_data(self, books_data: List[Dict]) -> List[Dict]:
+    @staticmethod
+    def clean_book_data(books_data: List[Dict]) -> List[Dict]:
         """Clean and validate book data"""
         cleaned_data = []
         for book in books_data:
@@ -60,57 +155,179 @@ class ContextAwareBookRecommender:
                     cleaned_data.append(cleaned_book)
                 
             except Exception as e:
-                print(f"Skipping invalid book: {str(e)}")
+                logger.warning(f"Skipping invalid book: {str(e)}")
                 continue
                 
-        print(f"Cleaned {len(cleaned_data)} valid books")
+        logger.info(f"Cleaned {len(cleaned_data)} valid books")
         return cleaned_data
 
-    def initialize_embeddings(self):
-        # Create embeddings for all book summaries
+    def build_generation(self, books_data: List[Dict], number: int) -> CatalogGeneration:
+        """Clean, embed and index a catalog without touching the live generation"""
         try:
-            summaries = [book['summaries'] for book in self.books_data]
+            cleaned = self.clean_book_data(books_data)
+            # Create embeddings for all book summaries
+            summaries = [book['summaries'] for book in cleaned]
             if not summaries:
                 raise ValueError("No valid book summaries found")
                 
-            self.embeddings = self.model.encode(summaries)
+            embeddings = self.model.encode(summaries).astype('float32')
             
-            # Initialize FAISS index
-            dimension = self.embeddings.shape[1]
-            self.index = faiss.IndexFlatL2(dimension)
-            self.index.add(self.embeddings.astype('float32'))
+            # Initialize the vector index (FAISS in-process by default, or sharded)
+            index = self.index_factory(embeddings.shape[1])
+            index.add(embeddings)
             
-            print(f"Successfully created embeddings for {len(summaries)} books")
+            generation = CatalogGeneration(
+                number=number,
+                books_data=cleaned,
+                # A sharded index holds the vectors on the shards, so the coordinator keeps no copy
+                embeddings=None if isinstance(index, ShardedIndex) else embeddings,
+                index=index,
+                # Built once so every response is highlighted in a single pass
+                title_matcher=TitleMatcher(book['book_name'] for book in cleaned),
+                # Trimmed prompt fragment per book, reused by every request
+                prompt_builder=PromptBuilder(cleaned, self.max_summary_tokens, self.prompt_token_budget),
+                knn_graph=(load_knn_graph(self.knn_graph_path, cleaned, encoder_signature(self.model))
+                           if self.knn_graph_path else None)
+            )
+            logger.info(f"Successfully created embeddings for {len(summaries)} books")
+            return generation
             
         except Exception as e:
-            print(f"Error creating embeddings: {str(e)}")
+            logger.error(f"Error creating embeddings: {str(e)}")
             raise
-        
+
+    # Read-only views of the live generation. Request code should grab
+    # self.generation once and use it throughout, so a reload mid-request
+    # cannot mix two catalogs.
+    @property
+    def generation(self) -> CatalogGeneration:
+        return self._generation
+
+    @property
+    def books_data(self) -> List[Dict]:
+        return self._generation.books_data
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        return self._generation.embeddings
+
+    @property
+    def index(self):
+        return self._generation.index
+
+    @property
+    def title_matcher(self) -> TitleMatcher:
+        return self._generation.title_matcher
+
+    @property
+    def prompt_builder(self) -> PromptBuilder:
+        return self._generation.prompt_builder
+
+    def reload_catalog(self, books_data: List[Dict]) -> CatalogGeneration:
+        """Build a new generation next to the live one, then swap it in atomically.
+
+        Searches already running keep their reference to the old generation and
+        finish on it; once the last one returns, the old books, embeddings and
+        index are garbage collected.
+        """
+        number = self._generation.number + 1
+        start = time.perf_counter()
+        generation = self.build_generation(books_data, number)
+        # A single reference assignment, so readers see either the old or the new catalog
+        self._generation = generation
+        logger.info(f"Catalog generation {number} live with {len(generation.books_data)} books "
+                    f"(built in {time.perf_counter() - start:.1f}s)")
+        return generation
+
+    def start_background_reload(self, load_books: Callable[[], List[Dict]]) -> bool:
+        """Reload the catalog on a background thread; False if a reload is already running"""
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        self.reload_status.update(state='running', last_error=None)
+
+        def run():
+            start = time.perf_counter()
+            try:
+                books_data = load_books()
+                if not books_data:
+                    raise ValueError("No books returned by catalog loader")
+                generation = self.reload_catalog(books_data)
+                self.reload_status.update(state='idle', generation=generation.number,
+                                          books=len(generation.books_data))
+            except Exception as e:
+                logger.error(f"Catalog reload failed, keeping current generation: {str(e)}")
+                self.reload_status.update(state='failed', last_error=str(e))
+            finally:
+                self.reload_status['last_duration'] = round(time.perf_counter() - start, 3)
+                self._reload_lock.release()
+
+        threading.Thread(target=run, name='catalog-reload', daemon=True).start()
+        return True
+
     def preprocess_query(self, query: str) -> str:
         # Clean and normalize query
         query = re.sub(r'[^\w\s]', '', query.lower())
         return query
         
     def get_similar_books(self, query: str, k: int = 5) -> List[Dict]:
+        return self.search_similar(self.encode_query(query), k)
+
+    def encode_query(self, query: str) -> np.ndarray:
+        """Encode a single query into a (1, dimension) float32 vector"""
         query = self.preprocess_query(query)
-        query_vector = self.model.encode([query])
-        
+        return self.model.encode([query]).astype('float32')
+
+    def search_similar(self, query_vector: np.ndarray, k: int = 5,
+                       generation: Optional[CatalogGeneration] = None) -> List[Dict]:
+        """Nearest books for an already encoded query vector, in the given generation or the live one"""
+        # Pin the generation so the index and book list always belong together
+        generation = generation or self._generation
         # Get more candidates initially for better filtering
-        distances, indices = self.index.search(query_vector.astype('float32'), k * 2)
+        distances, indices = generation.index.search(query_vector, k * 2)
         
+        scores = 1 / (1 + distances[0])
+        return self._collect_books(generation, indices[0], scores, k, seen_books=set())
+
+    def get_more_like_this(self, title: str, k: int = 5) -> Optional[List[Dict]]:
+        """Books similar to a catalog book, from its stored vector; None if the title is unknown.
+
+        With a kNN graph for this catalog the answer is a single row lookup,
+        otherwise the book's embedding is searched in the index (fetched from its
+        shard when the index is sharded). Either way the encoder is never called.
+        """
+        generation = self._generation
+        row = generation.title_rows.get(title)
+        if row is None:
+            return None
+        graph = generation.knn_graph
+        if graph is not None and graph.width >= k * 2:
+            return self._collect_books(generation, graph.neighbors[row], graph.scores[row], k,
+                                       seen_books={title})
+        if generation.embeddings is not None:
+            query_vector = generation.embeddings[row:row + 1]
+        else:
+            query_vector = generation.index.reconstruct(row).reshape(1, -1)
+        distances, indices = generation.index.search(query_vector, k * 2 + 1)
+        return self._collect_books(generation, indices[0], 1 / (1 + distances[0]), k, seen_books={title})
+
+    @staticmethod
+    def _collect_books(generation: CatalogGeneration, rows: np.ndarray, scores: np.ndarray, k: int,
+                       seen_books: set) -> List[Dict]:
         # Get unique recommendations considering both content and categories
-        seen_books = set()
         similar_books = []
         
-        for idx, distance in zip(indices[0], distances[0]):
-            book = self.books_data[idx]
+        for idx, score in zip(rows, scores):
+            # FAISS and the kNN graph pad with -1 when there are fewer hits
+            if idx < 0:
+                continue
+            book = generation.books_data[idx]
             if book['book_name'] not in seen_books and len(similar_books) < k:
                 seen_books.add(book['book_name'])
                 similar_books.append({
                     'title': book['book_name'],
                     'summary': book['summaries'],
                     'category': book['categories'],
-                    'similarity_score': float(1 / (1 + distance))
+                    'similarity_score': float(score)
                 })
         
         # Sort by similarity score
@@ -147,10 +364,20 @@ class ContextAwareBookRecommender:
             for conv in recent_conv:
                 summary_prompt += f"User: {conv['query']}\nAssistant: {conv['response']}\n"
             
-            summary_response = self.gemini_model.generate_content(summary_prompt)
-            self.conversation_summaries.append(summary_response.text)
+            # Summarize off the request path so history updates never wait on Gemini
+            future = self._summary_executor.submit(
+                self.gemini_model.generate_content, summary_prompt, request_options=self.llm_request_options
+            )
+            future.add_done_callback(self._store_conversation_summary)
+
+    def _store_conversation_summary(self, future: Future):
+        try:
+            self.conversation_summaries.append(future.result().text)
+        except Exception as e:
+            logger.warning(f"Conversation summary failed: {str(e)}")
 
-    def check_if_allowed_query(self, query: str) -> str:
+    @staticmethod
+    def check_if_allowed_query(query: str) -> str:
         # Only allow these types of queries
         allowed_patterns = {
             'book_related': [
@@ -196,8 +423,19 @@ class ContextAwareBookRecommender:
         
         return 'invalid'
 
-    def generate_response(self, query: str, similar_books: List[Dict], context: str) -> str:
-        query_type = self.check_if_allowed_query(query)
+    def generate_response(self, query: str, similar_books: List[Dict], context: str,
+                          query_type: str = None, prompt_stats: Optional[Dict] = None,
+                          generation: Optional[CatalogGeneration] = None) -> str:
+        """Answer a query from the retrieved books.
+
+        generation should be the one the books were retrieved from, so the
+        prompt and title highlighting use the same catalog; defaults to the
+        live one. When a prompt is built and prompt_stats is given, it is
+        filled with the prompt's size (books, characters, estimated tokens)
+        for request logging.
+        """
+        if query_type is None:
+            query_type = self.check_if_allowed_query(query)
         
         # Handle different query types
         if query_type == 'invalid':
@@ -225,48 +463,48 @@ class ContextAwareBookRecommender:
                 return """<div class="message-paragraph">I couldn't find any books matching your request. 
                 Could you try rephrasing or specifying a different genre?</div>"""
             
+            # Identical query and retrieved books means the earlier answer still applies
+            cache_key = (self.preprocess_query(query), tuple(book['title'] for book in similar_books))
+            if self.response_cache is not None:
+                cached_response = self.response_cache.get(cache_key)
+                if cached_response:
+                    return cached_response
+            
             # Create a focused prompt that enforces using only the provided books
-            prompt = f"""
-            You are a book recommender. ONLY recommend books from the following list. DO NOT mention or suggest any books not in this list:
-
-            {self._format_matched_books(similar_books)}
-
-            For the query "{query}", create a response following these STRICT rules:
-            1. Start with a brief greeting
-            2. ONLY recommend books from the above list
-            3. For each recommended book, include:
-               - Exact title as shown above
-               - Category as shown above
-               - Brief description using ONLY the provided summary
-            4. Use conversational language
-            5. End with a question about their reading preferences
-
-            IMPORTANT: 
-            - NEVER mention or suggest books not in the provided list
-            - Use EXACT titles and categories as shown
-            - Base descriptions ONLY on the provided summaries
-            """
+            generation = generation or self._generation
+            book_block, block_stats = generation.prompt_builder.build_book_block(similar_books)
+            prompt = RECOMMENDATION_PROMPT.format(book_block=book_block, query=query)
+            block_stats['prompt_tokens'] = estimate_tokens(prompt)
+            block_stats['prompt_chars'] = len(prompt)
+            if prompt_stats is not None:
+                prompt_stats.update(block_stats)
             
-            response = self.gemini_model.generate_content(
+            future = self._llm_executor.submit(
+                self.gemini_model.generate_content,
                 prompt,
                 generation_config={
                     "temperature": 0.7,
                     "top_p": 0.8,
                     "top_k": 40,
                     "max_output_tokens": 1024,
-                }
+                },
+                request_options=self.llm_request_options
             )
+            try:
+                response = future.result(timeout=self.llm_deadline)
+            except FuturesTimeoutError:
+                # Answer now from the retrieved books; a late LLM result only warms the cache
+                logger.warning(f"Gemini missed the {self.llm_deadline}s deadline, serving fallback response")
+                if not future.cancel() and self.response_cache is not None:
+                    future.add_done_callback(
+                        lambda done: self._cache_late_response(done, cache_key, similar_books, generation)
+                    )
+                return self._format_fallback_response(query, similar_books)
             
             if response and response.text:
-                # Verify that only books from our dataset are mentioned
-                response_text = response.text
-                book_titles = [book['title'] for book in similar_books]
-                
-                # Format response with verified book titles in bold
-                for title in book_titles:
-                    response_text = response_text.replace(title, f"<b>{title}</b>")
-                
-                formatted_response = f"""<div class="message-paragraph">{response_text}</div>"""
+                formatted_response = self._format_llm_response(response.text, similar_books, generation)
+                if self.response_cache is not None:
+                    self.response_cache.put(cache_key, formatted_response)
                 return formatted_response
             else:
                 return self._format_fallback_response(query, similar_books)
@@ -275,33 +513,33 @@ class ContextAwareBookRecommender:
             logger.error(f"Error generating response: {str(e)}")
             return self._format_fallback_response(query, similar_books)
 
+    def _format_llm_response(self, text: str, similar_books: List[Dict], generation: CatalogGeneration) -> str:
+        """Wrap raw LLM output, bolding retrieved titles and flagging unlisted ones"""
+        book_titles = [book['title'] for book in similar_books]
+        response_text, unlisted_titles = generation.title_matcher.highlight(
+            text, book_titles, mode=self.hallucination_mode
+        )
+        if unlisted_titles:
+            logger.warning(f"Response mentioned books outside the retrieved set: {unlisted_titles}")
+        return f"""<div class="message-paragraph">{response_text}</div>"""
+
+    def _cache_late_response(self, future: Future, cache_key: tuple, similar_books: List[Dict],
+                             generation: CatalogGeneration):
+        try:
+            response = future.result()
+            if response and response.text:
+                self.response_cache.put(cache_key,
+                                        self._format_llm_response(response.text, similar_books, generation))
+        except Exception as e:
+            logger.warning(f"Late Gemini response discarded: {str(e)}")
+
     def _format_matched_books(self, books: List[Dict]) -> str:
         """Format books for AI prompt with strict structure"""
-        if not books:
-            return "No matching books found."
-        
-        formatted = "AVAILABLE BOOKS FOR RECOMMENDATION:\n\n"
-        for i, book in enumerate(books, 1):
-            formatted += f"""
-            Book #{i}:
-            Title: {book['title']}
-            Category: {book['category']}
-            Summary: {book['summary']}
-            ----------------------------------------
-            """
-        return formatted
+        return self.prompt_builder.build_book_block(books)[0]
 
     def _format_available_books(self) -> str:
-        # Create a formatted string of all available books
-        available_books = ""
-        for _, row in self.books_data.iterrows():
-            available_books += f"""
-            Book: {row['book_name']}
-            Category: {row['categories']}
-            Summary: {row['summaries']}
-            ---
-            """
-        return available_books
+        # Create a formatted string of all available books from the precomputed fragments
+        return "---\n".join(fragment for fragment, _ in self.prompt_builder.fragments.values())
 
     def check_if_general_conversation(self, query: str) -> bool:
         # Enhanced conversation patterns
@@ -416,16 +654,13 @@ class ContextAwareBookRecommender:
         return False
 
     def format_response(self, raw_response: str, similar_books: List[Dict]) -> str:
-        formatted_response = raw_response
-        
-        # Format only book titles with styling
-        for book in similar_books:
-            # Use word boundaries to ensure we match complete titles
-            formatted_response = re.sub(
-                fr'\b{re.escape(book["title"])}\b',
-                f'<span class="book-title">{book["title"]}</span>',
-                formatted_response
-            )
+        # Format only retrieved book titles with styling
+        formatted_response, _ = self.title_matcher.highlight(
+            raw_response,
+            [book['title'] for book in similar_books],
+            template='<span class="book-title">{}</span>',
+            mode=self.hallucination_mode
+        )
         
         # Simple paragraph formatting without extra styling
         paragraphs = formatted_response.split('\n\n')
@@ -527,7 +762,7 @@ class ContextAwareBookRecommender:
             </div>"""
             
         except Exception as e:
-            print(f"Error in context summary: {str(e)}")
+            logger.error(f"Error in context summary: {str(e)}")
             return """<div class="greeting">I'm having trouble accessing our conversation history. Would you like to start fresh?</div>"""
 
     def format_topic_suggestions(self, topics: List[str]) -> str:
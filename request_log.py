@@ -0,0 +1,131 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+REQUEST_LOGGER_NAME = 'requests'
+
+# Request log settings; set REQUEST_LOG_ENABLED=0 to turn it off entirely
+REQUEST_LOG_ENABLED = os.getenv("REQUEST_LOG_ENABLED", "1") != "0"
+REQUEST_LOG_SAMPLE_RATE = float(os.getenv("REQUEST_LOG_SAMPLE_RATE", "1.0"))
+REQUEST_LOG_MAX_FIELD_CHARS = int(os.getenv("REQUEST_LOG_MAX_FIELD_CHARS", "200"))
+REQUEST_LOG_QUEUE_SIZE = int(os.getenv("REQUEST_LOG_QUEUE_SIZE", "10000"))
+# Where the JSON lines go; stderr when unset
+REQUEST_LOG_PATH = os.getenv("REQUEST_LOG_PATH")
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, message and the record's fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks: records are dropped and counted when the queue is full.
+
+    Only the cheap part of a record is prepared on the calling thread; JSON
+    encoding and the actual write happen on the listener thread.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve message args and tracebacks now; they may not survive until the listener runs
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+
+class RequestLogger:
+    """Structured per-request log with sampling and per-field size caps.
+
+    Successful requests are kept with probability sample_rate; errors are
+    always kept. String fields longer than max_field_chars are cut, so a
+    large query or response can never balloon a log line.
+    """
+
+    def __init__(self, logger: logging.Logger, handler: DroppingQueueHandler, listener: QueueListener,
+                 sample_rate: float = 1.0, max_field_chars: int = 200):
+        self.logger = logger
+        self.handler = handler
+        self.listener = listener
+        self.sample_rate = sample_rate
+        self.max_field_chars = max_field_chars
+        self.sampled_out = 0
+
+    def log_request(self, fields: Dict, error: bool = False):
+        if not error and self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            self.sampled_out += 1
+            return
+        capped = {}
+        for name, value in fields.items():
+            if isinstance(value, str) and len(value) > self.max_field_chars:
+                value = value[:self.max_field_chars] + '…'
+            capped[name] = value
+        self.logger.log(logging.ERROR if error else logging.INFO, 'request', extra={'fields': capped})
+
+    def stats(self) -> Dict:
+        return {
+            'sample_rate': self.sample_rate,
+            'sampled_out': self.sampled_out,
+            'dropped': self.handler.dropped,
+            'queued': self.handler.queue.qsize()
+        }
+
+    def close(self):
+        # Flushes whatever is still queued; safe to call more than once
+        self.logger.removeHandler(self.handler)
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+
+def setup_request_logging(path: Optional[str] = REQUEST_LOG_PATH, sample_rate: float = REQUEST_LOG_SAMPLE_RATE,
+                          max_field_chars: int = REQUEST_LOG_MAX_FIELD_CHARS,
+                          queue_size: int = REQUEST_LOG_QUEUE_SIZE) -> RequestLogger:
+    """Attach a queue-backed JSON handler to the 'requests' logger and start its writer thread"""
+    output = logging.FileHandler(path) if path else logging.StreamHandler()
+    output.setFormatter(JsonFormatter())
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    handler = DroppingQueueHandler(log_queue)
+    listener = QueueListener(log_queue, output)
+
+    logger = logging.getLogger(REQUEST_LOGGER_NAME)
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    # Keep request records out of the root logger's synchronous handlers
+    logger.propagate = False
+    listener.start()
+
+    request_logger = RequestLogger(logger, handler, listener, sample_rate, max_field_chars)
+    atexit.register(request_logger.close)
+    return request_logger
@@ -0,0 +1,151 @@
+import cProfile
+import hmac
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Optional
+
+from flask import Flask, g, request
+
+# Profiling is off unless PROFILE_TOKEN or PROFILE_SAMPLE_RATE is set. PROFILE_TOKEN is its own
+# secret, not ADMIN_TOKEN, since clients send it on ordinary requests.
+# A request is profiled when it sends "X-Profile: <token>" or is picked by the sample rate.
+PROFILE_HEADER = 'X-Profile'
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# 'sampling' writes folded stacks (flamegraph.pl, speedscope), 'cprofile' writes pstats
+PROFILE_MODE = os.getenv("PROFILE_MODE", "sampling")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "1")) / 1000
+PROFILE_PATHS = [path.strip() for path in os.getenv("PROFILE_PATHS", "/get_recommendation").split(',') if path.strip()]
+
+logger = logging.getLogger(__name__)
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack at a fixed interval and counts identical stacks.
+
+    Time spent blocked (e.g. waiting for Gemini on a worker thread) shows up
+    as the frame doing the waiting, so wall-clock hot spots are visible too.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.stacks[';'.join(reversed(stack))] += 1
+                self.samples += 1
+            self._stop.wait(self.interval)
+
+    def write_folded(self, path: str):
+        # One "frame;frame;frame count" line per distinct stack
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class RequestProfiler:
+    """Flask hooks that profile selected requests and write one file per request"""
+
+    def __init__(self, directory: str = PROFILE_DIR, mode: str = PROFILE_MODE, token: Optional[str] = PROFILE_TOKEN,
+                 sample_rate: float = PROFILE_SAMPLE_RATE, interval: float = PROFILE_INTERVAL,
+                 paths=PROFILE_PATHS):
+        if mode not in ('sampling', 'cprofile'):
+            raise ValueError(f"Unknown profile mode: {mode}")
+        self.directory = directory
+        self.mode = mode
+        self.token = token
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.paths = set(paths)
+
+    def should_profile(self) -> bool:
+        if request.path not in self.paths:
+            return False
+        header = request.headers.get(PROFILE_HEADER)
+        if self.token and header and hmac.compare_digest(header.encode(), self.token.encode()):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def before_request(self):
+        if not self.should_profile():
+            return
+        g.profile_id = uuid.uuid4().hex[:12]
+        g.profile_start = time.perf_counter()
+        if self.mode == 'cprofile':
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler is already active on this interpreter; skip this one
+                g.profile_id = None
+                return
+        else:
+            profiler = SamplingProfiler(threading.get_ident(), self.interval)
+            profiler.start()
+        g.profiler = profiler
+
+    def after_request(self, response):
+        if g.get('profile_id'):
+            response.headers['X-Profile-Id'] = g.profile_id
+        return response
+
+    def teardown_request(self, exc=None):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return
+        if self.mode == 'cprofile':
+            profiler.disable()
+        else:
+            profiler.stop()
+        elapsed_ms = (time.perf_counter() - g.profile_start) * 1000
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')
+            base = os.path.join(self.directory, f"{stamp}-{g.profile_id}")
+            if self.mode == 'cprofile':
+                path = base + '.prof'
+                profiler.dump_stats(path)
+            else:
+                path = base + '.folded'
+                profiler.write_folded(path)
+            logger.info(f"Profiled {request.path} ({elapsed_ms:.1f} ms) -> {path}")
+        except OSError as e:
+            logger.warning(f"Could not write profile {g.profile_id}: {str(e)}")
+
+
+def install_request_profiler(app: Flask, **options) -> Optional[RequestProfiler]:
+    """Register the profiling hooks; with no token and no sample rate nothing is registered at all"""
+    profiler = RequestProfiler(**options)
+    if not profiler.token and profiler.sample_rate <= 0:
+        return None
+    app.before_request(profiler.before_request)
+    app.after_request(profiler.after_request)
+    app.teardown_request(profiler.teardown_request)
+    return profiler
@@ -0,0 +1,59 @@
+import os
+from typing import Hashable
+
+import numpy as np
+
+from response_cache import ResponseCache
+
+# How many earlier query vectors a session keeps and how fast they fade
+SESSION_HISTORY = int(os.getenv("SESSION_HISTORY", "3"))
+SESSION_DECAY = float(os.getenv("SESSION_DECAY", "0.5"))
+# History only pulls the query along when it is this similar (cosine); below it the topic changed
+SESSION_MIN_SIMILARITY = float(os.getenv("SESSION_MIN_SIMILARITY", "0.2"))
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "1000"))
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "1800"))
+
+
+class SessionVectorCache:
+    """Last few query vectors per chat, blended into follow-up queries before search.
+
+    The new vector keeps weight 1 and the i-th previous one gets decay**i; the
+    blend is their weighted mean, rescaled to the new query's norm. Only raw
+    (unblended) query vectors are stored, so context fades out instead of
+    compounding. Sessions live in a bounded LRU with a TTL.
+    """
+
+    def __init__(self, history: int = SESSION_HISTORY, decay: float = SESSION_DECAY,
+                 min_similarity: float = SESSION_MIN_SIMILARITY, max_sessions: int = SESSION_CACHE_SIZE,
+                 ttl_seconds: float = SESSION_CACHE_TTL):
+        self.history = history
+        self.decay = decay
+        self.min_similarity = min_similarity
+        self.weights = decay ** np.arange(1, history + 1, dtype='float32')
+        self._sessions = ResponseCache(max_sessions, ttl_seconds)
+
+    def blend(self, session_id: Hashable, query_vector: np.ndarray) -> np.ndarray:
+        """Blend a (1, d) query vector with the session's history and remember the raw vector"""
+        if self.history == 0:
+            return query_vector
+        previous = self._sessions.get(session_id)
+        # Newest first; a fresh array per update, so readers never see a half-written history
+        stored = query_vector if previous is None else np.vstack([query_vector, previous])[:self.history]
+        self._sessions.put(session_id, stored)
+        if previous is None:
+            return query_vector
+
+        weights = self.weights[:len(previous)]
+        context = weights @ previous / weights.sum()
+        norms = np.linalg.norm(query_vector[0]) * np.linalg.norm(context)
+        if norms == 0 or float(query_vector[0] @ context) / norms < self.min_similarity:
+            return query_vector
+        blended = (query_vector[0] + weights @ previous) / (1 + weights.sum())
+        # Averaging shrinks the vector; against an L2 index that would favour low-norm books
+        blended_norm = np.linalg.norm(blended)
+        if blended_norm > 0:
+            blended *= np.linalg.norm(query_vector[0]) / blended_norm
+        return blended[None, :].astype('float32')
+
+    def __len__(self) -> int:
+        return len(self._sessions)
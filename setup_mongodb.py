@@ -1,5 +1,6 @@
 from pymongo import MongoClient
 from dotenv import load_dotenv
+from database import create_book_indexes, create_chat_indexes
 import os
 import sys
 
@@ -24,6 +25,14 @@ def setup_mongodb():
             db.create_collection('books')
             print("Created 'books' collection")
         
+        # Indexes for title, category and full-text lookups
+        if create_book_indexes(db['books']):
+            print("Indexes ready on 'books' collection")
+        
+        # Unique (chat_id, seq) index that makes resent chat messages no-ops
+        if create_chat_indexes(db['chat_messages']):
+            print("Indexes ready on 'chat_messages' collection")
+        
         # Test the connection
         client.server_info()
         print("\n✅ MongoDB Connection Successful!")
@@ -0,0 +1,312 @@
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import struct
+import threading
+import uuid
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Listener, Client
+from typing import List, Tuple
+
+import faiss
+import numpy as np
+
+# Wire protocol: one frame per message over an authkey-authenticated socket,
+# sent with Connection.send_bytes so nothing is ever unpickled. A frame is a
+# 4-byte header length, a JSON header, then the raw bytes of each array the
+# header describes (dtype and shape). Every request gets one reply whose
+# header has status 'ok' (plus 'result' and/or arrays) or 'error' (plus 'message').
+#   {'command': 'add', 'name', 'dimension'} + [vectors, ids]  -> result: vectors in that index
+#   {'command': 'search', 'name', 'k'} + [queries]            -> [distances, global ids]
+#   {'command': 'reconstruct', 'name'} + [global ids]         -> [vectors]
+#   {'command': 'drop', 'name'}                               -> result: None
+#   {'command': 'stats'}                                      -> result: {index name: vector count}
+WIRE_DTYPES = {'float32', 'int64'}
+_HEADER_LENGTH = struct.Struct('!I')
+
+
+def _require_authkey(authkey: bytes) -> bytes:
+    # Shards accept writes from anyone holding the key, so there is no built-in default
+    if not authkey:
+        raise ValueError("Shard authkey is required (set SHARD_AUTHKEY)")
+    return authkey
+
+
+def encode_frame(header: dict, arrays: List[np.ndarray] = ()) -> bytes:
+    arrays = [np.ascontiguousarray(array) for array in arrays]
+    header = dict(header, arrays=[{'dtype': array.dtype.name, 'shape': list(array.shape)} for array in arrays])
+    encoded = json.dumps(header).encode('utf-8')
+    return b''.join([_HEADER_LENGTH.pack(len(encoded)), encoded] + [array.tobytes() for array in arrays])
+
+
+def decode_frame(frame: bytes) -> Tuple[dict, List[np.ndarray]]:
+    (length,) = _HEADER_LENGTH.unpack_from(frame)
+    offset = _HEADER_LENGTH.size + length
+    header = json.loads(frame[_HEADER_LENGTH.size:offset].decode('utf-8'))
+    arrays = []
+    for spec in header.pop('arrays', []):
+        if spec['dtype'] not in WIRE_DTYPES:
+            raise ValueError(f"Unsupported array dtype on the wire: {spec['dtype']}")
+        dtype = np.dtype(spec['dtype'])
+        shape = tuple(int(size) for size in spec['shape'])
+        size = int(np.prod(shape, dtype='int64')) * dtype.itemsize
+        if offset + size > len(frame):
+            raise ValueError("Truncated shard frame")
+        arrays.append(np.frombuffer(frame, dtype=dtype, count=size // dtype.itemsize, offset=offset).reshape(shape))
+        offset += size
+    return header, arrays
+
+
+class ShardServer:
+    """Holds one partition of each named index and answers searches over a socket.
+
+    Several named indexes can live side by side, so a catalog reload can build
+    its new partition while the previous generation still serves searches.
+    """
+
+    def __init__(self, address: Tuple[str, int], authkey: bytes, threads: int = None):
+        _require_authkey(authkey)
+        if threads:
+            faiss.omp_set_num_threads(threads)
+        self.listener = Listener(address, authkey=authkey)
+        self.address = self.listener.address
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def serve_forever(self):
+        while True:
+            try:
+                connection = self.listener.accept()
+            except OSError:
+                break
+            except Exception as e:
+                # Failed handshakes (wrong authkey) should not stop the shard
+                print(f"Rejected shard connection: {str(e)}")
+                continue
+            threading.Thread(target=self._handle, args=(connection,), daemon=True).start()
+
+    def _handle(self, connection):
+        with connection:
+            while True:
+                try:
+                    frame = connection.recv_bytes()
+                except (EOFError, OSError):
+                    return
+                try:
+                    header, arrays = decode_frame(frame)
+                    result, result_arrays = self._dispatch(header, arrays)
+                    reply = encode_frame({'status': 'ok', 'result': result}, result_arrays)
+                except Exception as e:
+                    reply = encode_frame({'status': 'error', 'message': str(e)})
+                connection.send_bytes(reply)
+
+    def _dispatch(self, header: dict, arrays: List[np.ndarray]):
+        command = header.get('command')
+        if command == 'search':
+            index = self._indexes[header['name']]
+            (queries,) = arrays
+            return None, list(index.search(queries, int(header['k'])))
+        if command == 'reconstruct':
+            index = self._indexes[header['name']]
+            (ids,) = arrays
+            return None, [np.vstack([index.reconstruct(int(i)) for i in ids])]
+        if command == 'add':
+            vectors, ids = arrays
+            with self._lock:
+                index = self._indexes.get(header['name'])
+                if index is None:
+                    # IDMap keeps catalog-wide ids so the coordinator can merge without remapping;
+                    # IDMap2 can also hand a vector back by that id
+                    index = faiss.IndexIDMap2(faiss.IndexFlatL2(int(header['dimension'])))
+                    self._indexes[header['name']] = index
+                index.add_with_ids(vectors, ids)
+                return index.ntotal, []
+        if command == 'drop':
+            with self._lock:
+                self._indexes.pop(header['name'], None)
+            return None, []
+        if command == 'stats':
+            return {name: index.ntotal for name, index in self._indexes.items()}, []
+        raise ValueError(f"Unknown shard command: {command}")
+
+
+def _run_local_shard(ready, authkey: bytes, threads: int):
+    server = ShardServer(('127.0.0.1', 0), authkey, threads)
+    ready.send(server.address)
+    ready.close()
+    server.serve_forever()
+
+
+class ShardClient:
+    """Connection pool to one shard; each in-flight request borrows its own connection"""
+
+    def __init__(self, address: Tuple[str, int], authkey: bytes):
+        self.address = tuple(address)
+        self.authkey = _require_authkey(authkey)
+        self._pool = queue.LifoQueue()
+
+    def call(self, command: str, arrays: List[np.ndarray] = (), **fields):
+        """Send one command and return (result, arrays) from the shard's reply"""
+        try:
+            connection = self._pool.get_nowait()
+        except queue.Empty:
+            connection = Client(self.address, authkey=self.authkey)
+        try:
+            connection.send_bytes(encode_frame(dict(fields, command=command), arrays))
+            header, reply_arrays = decode_frame(connection.recv_bytes())
+        except Exception:
+            connection.close()
+            raise
+        self._pool.put(connection)
+        if header.get('status') != 'ok':
+            raise RuntimeError(f"Shard {self.address} failed: {header.get('message')}")
+        return header.get('result'), reply_arrays
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def _drop_remote_index(clients: List[ShardClient], name: str, executor: ThreadPoolExecutor):
+    executor.shutdown(wait=False)
+    for client in clients:
+        try:
+            client.call('drop', name=name)
+        except Exception:
+            pass
+        client.close()
+
+
+class ShardedIndex:
+    """Coordinator with the faiss index interface used by the recommender (d, ntotal, add, search, reconstruct).
+
+    Vectors are spread round-robin across shards under catalog-wide ids and
+    live only there; a search fans the query batch out to every shard in
+    parallel and merges the per-shard top-k by distance, and reconstruct
+    fetches one vector from the shard that holds it. The remote partitions are dropped when this
+    object is garbage collected, e.g. after a catalog reload.
+    """
+
+    def __init__(self, addresses: List[Tuple[str, int]], dimension: int, authkey: bytes):
+        if not addresses:
+            raise ValueError("ShardedIndex needs at least one shard address")
+        _require_authkey(authkey)
+        self.d = dimension
+        self.ntotal = 0
+        self.name = uuid.uuid4().hex
+        self.shards = [ShardClient(address, authkey) for address in addresses]
+        self._executor = ThreadPoolExecutor(max_workers=len(self.shards) * 4, thread_name_prefix='shard')
+        self._finalizer = weakref.finalize(self, _drop_remote_index, self.shards, self.name, self._executor)
+
+    def add(self, vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype='float32')
+        ids = np.arange(self.ntotal, self.ntotal + len(vectors), dtype='int64')
+        num_shards = len(self.shards)
+        futures = [
+            self._executor.submit(shard.call, 'add', [vectors[position::num_shards], ids[position::num_shards]],
+                                  name=self.name, dimension=self.d)
+            for position, shard in enumerate(self.shards)
+        ]
+        for future in futures:
+            future.result()
+        self.ntotal += len(vectors)
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = np.ascontiguousarray(queries, dtype='float32')
+        futures = [self._executor.submit(shard.call, 'search', [queries], name=self.name, k=k)
+                   for shard in self.shards]
+        results = [future.result()[1] for future in futures]
+        distances = np.hstack([d for d, _ in results])
+        ids = np.hstack([i for _, i in results])
+        # Missing neighbours come back as id -1; push them past every real hit
+        distances = np.where(ids < 0, np.inf, distances)
+        order = np.argsort(distances, axis=1, kind='stable')[:, :k]
+        merged_distances = np.take_along_axis(distances, order, axis=1)
+        merged_ids = np.take_along_axis(ids, order, axis=1)
+        return merged_distances.astype('float32'), merged_ids
+
+    def reconstruct(self, key: int) -> np.ndarray:
+        """The stored vector with catalog-wide id key, as a (d,) array"""
+        if not 0 <= key < self.ntotal:
+            raise ValueError(f"Vector id {key} out of range for {self.ntotal} vectors")
+        # Round-robin placement means id key went to shard key % num_shards
+        shard = self.shards[key % len(self.shards)]
+        _, (vectors,) = shard.call('reconstruct', [np.array([key], dtype='int64')], name=self.name)
+        return vectors[0]
+
+    def close(self):
+        self._finalizer()
+
+
+class LocalShardCluster:
+    """Runs N shard servers as local processes, a stand-in for shards on separate nodes.
+
+    Without an authkey a random one is generated for this cluster.
+    """
+
+    def __init__(self, num_shards: int, authkey: bytes = None, threads_per_shard: int = 1):
+        authkey = authkey or os.urandom(32)
+        self.authkey = authkey
+        self.processes = []
+        self.addresses = []
+        context = multiprocessing.get_context('spawn')
+        for _ in range(num_shards):
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(target=_run_local_shard, args=(sender, authkey, threads_per_shard),
+                                      daemon=True)
+            process.start()
+            self.addresses.append(receiver.recv())
+            receiver.close()
+            self.processes.append(process)
+
+    def index_factory(self, dimension: int) -> ShardedIndex:
+        """Drop-in for faiss.IndexFlatL2 when passed to ContextAwareBookRecommender"""
+        return ShardedIndex(self.addresses, dimension, self.authkey)
+
+    def close(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join(timeout=5)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def parse_shard_addresses(spec: str) -> List[Tuple[str, int]]:
+    """Parse 'host:port,host:port' as used by the SEARCH_SHARDS setting"""
+    addresses = []
+    for item in spec.split(','):
+        item = item.strip()
+        if item:
+            host, port = item.rsplit(':', 1)
+            addresses.append((host, int(port)))
+    return addresses
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a vector search shard server")
+    parser.add_argument('--host', default='127.0.0.1', help="Interface to bind; use 0.0.0.0 only on a private network")
+    parser.add_argument('--port', type=int, default=7001)
+    parser.add_argument('--threads', type=int, default=None, help="FAISS threads for this shard")
+    parser.add_argument('--authkey', default=os.getenv("SHARD_AUTHKEY"), help="Shared secret (default: SHARD_AUTHKEY)")
+    args = parser.parse_args()
+    if not args.authkey:
+        parser.error("a shard authkey is required: pass --authkey or set SHARD_AUTHKEY")
+
+    server = ShardServer((args.host, args.port), args.authkey.encode(), args.threads)
+    print(f"Shard listening on {server.address[0]}:{server.address[1]}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -102,6 +102,7 @@ function sendMessage() {
         },
         body: JSON.stringify({ 
             query: query,
+            chat_id: String(currentChatId),
             context: {
                 lastTopic: currentContext.lastTopic,
                 category: currentContext.category,
@@ -131,7 +132,7 @@ function sendMessage() {
 
         // Display recommendations if they exist
         if (data.recommendations && data.recommendations.length > 0) {
-            displayRecommendations(data.recommendations);
+            displayRecommendations(data.recommendations, data.next_cursor);
             saveChat(JSON.stringify(data.recommendations), 'recommendations');
         }
     })
@@ -168,7 +169,7 @@ function addMessageToChat(role, content) {
     return messageDiv;
 }
 
-function displayRecommendations(recommendations) {
+function displayRecommendations(recommendations, nextCursor = null) {
     const container = document.getElementById('recommendations-container');
     
     if (!recommendations || recommendations.length === 0) {
@@ -192,10 +193,57 @@ function displayRecommendations(recommendations) {
                         </div>
                     ` : ''}
                     <p class="book-summary">${book.summary}</p>
+                    <button class="more-like-this" data-title="${encodeURIComponent(book.title)}">More like this</button>
                 </div>
             `).join('')}
+            ${nextCursor ? `<button class="show-more">Show more</button>` : ''}
         </div>
     `;
+
+    container.querySelectorAll('.more-like-this').forEach(button => {
+        button.addEventListener('click', () => showMoreLikeThis(decodeURIComponent(button.dataset.title)));
+    });
+
+    const showMoreButton = container.querySelector('.show-more');
+    if (showMoreButton) {
+        showMoreButton.addEventListener('click', () => showMoreRecommendations(recommendations, nextCursor));
+    }
+}
+
+// Later pages come from the list the server ranked for the last query
+function showMoreRecommendations(shown, cursor) {
+    fetch('/more_recommendations', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ chat_id: String(currentChatId), cursor: cursor })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (!data.success) {
+            displayRecommendations(shown);
+            return;
+        }
+        const recommendations = shown.concat(data.recommendations || []);
+        displayRecommendations(recommendations, data.next_cursor);
+        saveChat(JSON.stringify(data.recommendations), 'recommendations');
+    })
+    .catch(error => console.error('Error loading more recommendations:', error));
+}
+
+// Similar books come straight from the catalog vectors, no new query is sent
+function showMoreLikeThis(title) {
+    fetch(`/more_like_this?title=${encodeURIComponent(title)}`)
+    .then(response => response.json())
+    .then(data => {
+        if (!data.success || !data.recommendations || data.recommendations.length === 0) {
+            return;
+        }
+        displayRecommendations(data.recommendations);
+        saveChat(JSON.stringify(data.recommendations), 'recommendations');
+    })
+    .catch(error => console.error('Error loading similar books:', error));
 }
 
 // Handle enter key in input
@@ -422,6 +470,12 @@ function confirmDelete() {
         const chats = JSON.parse(localStorage.getItem('bookChats') || '{}');
         delete chats[chatToDelete];
         localStorage.setItem('bookChats', JSON.stringify(chats));
+        const cursors = JSON.parse(localStorage.getItem('bookChatCursors') || '{}');
+        delete cursors[chatToDelete];
+        localStorage.setItem('bookChatCursors', JSON.stringify(cursors));
+        const serverIds = JSON.parse(localStorage.getItem('bookChatServerIds') || '{}');
+        delete serverIds[chatToDelete];
+        localStorage.setItem('bookChatServerIds', JSON.stringify(serverIds));
         
         if (chatToDelete === currentChatId) {
             startNewChat();
@@ -433,18 +487,60 @@ function confirmDelete() {
 }
 
 // Add auto-save functionality
+// Only messages after the server's cursor are sent, so each save is one message's worth.
+// The first save of a chat gets an id from the server; later saves must send that id.
+let autoSaveInFlight = false;
+let autoSavePending = false;
+
 function autoSaveChat() {
+    if (autoSaveInFlight) {
+        autoSavePending = true;
+        return;
+    }
+    const chatId = String(currentChatId);
     const chats = JSON.parse(localStorage.getItem('bookChats') || '{}');
+    const cursors = JSON.parse(localStorage.getItem('bookChatCursors') || '{}');
+    const serverIds = JSON.parse(localStorage.getItem('bookChatServerIds') || '{}');
+    const serverId = serverIds[chatId];
+    const messages = chats[chatId] || [];
+    // A chat without a server id yet is saved from the start
+    const cursor = serverId ? (cursors[chatId] || 0) : 0;
+    const delta = messages.slice(cursor, cursor + 100);
+    if (delta.length === 0) return;
+
+    autoSaveInFlight = true;
     fetch('/save_chat', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
         },
         body: JSON.stringify({
-            id: currentChatId,
-            messages: chats[currentChatId]
+            id: serverId,
+            cursor: cursor,
+            messages: delta
         })
-    }).catch(error => console.error('Auto-save failed:', error));
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            const latestIds = JSON.parse(localStorage.getItem('bookChatServerIds') || '{}');
+            latestIds[chatId] = data.id;
+            localStorage.setItem('bookChatServerIds', JSON.stringify(latestIds));
+            const latest = JSON.parse(localStorage.getItem('bookChatCursors') || '{}');
+            latest[chatId] = serverId ? Math.max(latest[chatId] || 0, data.cursor) : data.cursor;
+            localStorage.setItem('bookChatCursors', JSON.stringify(latest));
+            // More messages may be waiting beyond this batch
+            if (data.cursor < messages.length) autoSavePending = true;
+        }
+    })
+    .catch(error => console.error('Auto-save failed:', error))
+    .finally(() => {
+        autoSaveInFlight = false;
+        if (autoSavePending) {
+            autoSavePending = false;
+            autoSaveChat();
+        }
+    });
 }
 
 // Add keyboard shortcuts
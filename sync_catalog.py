@@ -0,0 +1,110 @@
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import pandas as pd
+
+from database import DatabaseManager, content_hash
+from ingest_catalog import clean_chunk, DEFAULT_CHUNK_SIZE, REQUIRED_COLUMNS
+
+DEFAULT_CHANGES_PATH = 'catalog_changes.json'
+
+
+def sync_csv(csv_path: str, changes_path: str = DEFAULT_CHANGES_PATH, chunk_size: int = DEFAULT_CHUNK_SIZE,
+             delete_missing: bool = True, dry_run: bool = False,
+             db_manager: DatabaseManager = None) -> Optional[Dict]:
+    """Bring the books collection in line with a CSV, writing only what changed.
+
+    Each CSV book's content_hash is compared with the stored one: new titles
+    are inserted, titles whose hash differs are updated, and (unless
+    delete_missing is False) stored titles absent from the CSV are deleted.
+    The first row wins when a title repeats in the CSV. The changed titles are
+    written to changes_path for downstream re-indexing. Returns the summary,
+    or None if the CSV was unusable or a write failed.
+    """
+    db_manager = db_manager or DatabaseManager()
+    start_time = time.perf_counter()
+
+    # Books written before hashes existed get one, so they don't all look changed
+    backfilled = 0 if dry_run else db_manager.backfill_content_hashes()
+    if backfilled:
+        print(f"Backfilled content_hash on {backfilled} existing books")
+    stored = db_manager.get_content_hashes()
+    print(f"Comparing against {len(stored)} stored books")
+
+    inserted, updated = [], []
+    seen = set()
+    unchanged = 0
+    for df in pd.read_csv(csv_path, chunksize=chunk_size):
+        missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
+        if missing:
+            print(f"CSV is missing required columns: {missing}")
+            return None
+        writes = []
+        for book in clean_chunk(df):
+            title = book['book_name']
+            if title in seen:
+                continue
+            seen.add(title)
+            stored_hash = stored.get(title)
+            if stored_hash is None and title not in stored:
+                inserted.append(title)
+            elif stored_hash != content_hash(book):
+                updated.append(title)
+            else:
+                unchanged += 1
+                continue
+            writes.append(book)
+        if writes and not dry_run and db_manager.upsert_many_books(writes) is None:
+            print("Sync stopped: a batch failed to write; rerun to finish (already written books are skipped)")
+            return None
+        print(f"Progress: {len(seen)} CSV books | {len(inserted)} new | {len(updated)} changed")
+
+    if not seen:
+        # An empty or unreadable export must never wipe the catalog
+        print("No books found in CSV, nothing synced")
+        return None
+    deleted = [title for title in stored if title not in seen] if delete_missing else []
+    if deleted and not dry_run:
+        db_manager.delete_books(deleted)
+
+    summary = {
+        'csv_path': os.path.abspath(csv_path),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'dry_run': dry_run,
+        'counts': {'inserted': len(inserted), 'updated': len(updated), 'deleted': len(deleted),
+                   'unchanged': unchanged},
+        # Titles are the book ids used across the app (unique book_name index)
+        'inserted': inserted,
+        'updated': updated,
+        'deleted': deleted
+    }
+    tmp_path = changes_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(summary, f, ensure_ascii=False)
+    os.replace(tmp_path, changes_path)
+
+    elapsed = time.perf_counter() - start_time
+    print(f"Sync {'planned' if dry_run else 'done'} in {elapsed:.1f}s: {summary['counts']}")
+    print(f"Changed titles written to {changes_path}")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply only the CSV rows that changed to the books collection")
+    parser.add_argument('csv_path')
+    parser.add_argument('--changes', default=DEFAULT_CHANGES_PATH, help="Where to write the changed-title list")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--keep-missing', action='store_true', help="Don't delete books that are not in the CSV")
+    parser.add_argument('--dry-run', action='store_true', help="Report the diff without writing")
+    args = parser.parse_args()
+
+    sync_csv(args.csv_path, args.changes, args.chunk_size, delete_missing=not args.keep_missing,
+             dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import random
+import time
+import zlib
+import numpy as np
+from typing import List, Dict
+
+# Vocabulary for synthetic books; categories mirror the genres the chatbot is asked about
+CATEGORIES = [
+    'Fantasy', 'Science Fiction', 'Romance', 'Mystery', 'Thriller', 'Biography',
+    'History', 'Classic Fiction', 'Literary Fiction', 'Horror', 'Self-Help', 'Poetry'
+]
+ADJECTIVES = [
+    'silent', 'broken', 'golden', 'hidden', 'last', 'forgotten', 'burning', 'distant',
+    'crimson', 'endless', 'quiet', 'savage', 'gentle', 'iron', 'hollow', 'wild'
+]
+NOUNS = [
+    'kingdom', 'river', 'empire', 'garden', 'storm', 'city', 'detective', 'witch',
+    'starship', 'letter', 'island', 'crown', 'mirror', 'forest', 'machine', 'heart'
+]
+THEMES = [
+    'love', 'betrayal', 'war', 'friendship', 'revenge', 'survival', 'power', 'family',
+    'identity', 'loss', 'courage', 'ambition', 'freedom', 'memory', 'faith', 'justice'
+]
+CHARACTERS = [
+    'a young orphan', 'a retired soldier', 'a brilliant scientist', 'two sisters',
+    'a disgraced knight', 'a small-town sheriff', 'an exiled prince', 'a reluctant heir'
+]
+QUERY_TEMPLATES = [
+    'recommend me some {category} books',
+    'books about {theme} and {theme2}',
+    'a {adjective} {category} novel about {theme}',
+    'something like {title}',
+    'best {category} books with a {adjective} {noun}'
+]
+
+
+def generate_books(count: int, seed: int = 42) -> List[Dict]:
+    """Generate a synthetic catalog shaped like the books collection"""
+    rng = random.Random(seed)
+    books = []
+    for i in range(count):
+        category = rng.choice(CATEGORIES)
+        adjective = rng.choice(ADJECTIVES)
+        noun = rng.choice(NOUNS)
+        themes = rng.sample(THEMES, 3)
+        summary = (
+            f"A {category.lower()} story about {rng.choice(CHARACTERS)} and a {adjective} {noun}. "
+            f"It explores {themes[0]}, {themes[1]} and {themes[2]} "
+            f"as the journey across the {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} unfolds."
+        )
+        books.append({
+            # Suffix keeps titles unique, like the deduplicated production catalog
+            'book_name': f"The {adjective.title()} {noun.title()} {i}",
+            'summaries': summary,
+            'categories': category
+        })
+    return books
+
+
+def generate_queries(count: int, books: List[Dict], seed: int = 7) -> List[str]:
+    """Generate free-text queries mixing genre, theme and title lookups"""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        template = rng.choice(QUERY_TEMPLATES)
+        theme, theme2 = rng.sample(THEMES, 2)
+        queries.append(template.format(
+            category=rng.choice(CATEGORIES).lower(),
+            theme=theme,
+            theme2=theme2,
+            adjective=rng.choice(ADJECTIVES),
+            noun=rng.choice(NOUNS),
+            title=rng.choice(books)['book_name'] if books else ''
+        ))
+    return queries
+
+
+class FakeEncoder:
+    """Fast deterministic stand-in for SentenceTransformer using feature hashing.
+
+    Shares the encode(List[str]) -> np.ndarray interface so it can be passed as
+    ContextAwareBookRecommender(model=...). Needs no network or model weights.
+    """
+
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+        self._token_cache = {}
+
+    def _token_slot(self, token: str):
+        slot = self._token_cache.get(token)
+        if slot is None:
+            h = zlib.crc32(token.encode('utf-8'))
+            slot = (h % self.dimension, 1.0 if (h >> 16) & 1 else -1.0)
+            self._token_cache[token] = slot
+        return slot
+
+    def encode(self, sentences: List[str], **kwargs) -> np.ndarray:
+        vectors = np.zeros((len(sentences), self.dimension), dtype='float32')
+        for row, sentence in enumerate(sentences):
+            for token in sentence.lower().split():
+                column, sign = self._token_slot(token.strip('.,!?'))
+                vectors[row, column] += sign
+        # Unit length like normalized sentence embeddings
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+class StubGeminiResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubGeminiModel:
+    """Offline replacement for genai.GenerativeModel returning a canned answer.
+
+    latency/jitter (seconds) simulate upstream model time; failure_rate makes a
+    fraction of calls raise like a flaky API would.
+    """
+
+    def __init__(self, text: str = "Here are some books you might enjoy.", latency: float = 0.0,
+                 jitter: float = 0.0, failure_rate: float = 0.0, seed: int = None):
+        self.text = text
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+
+    def generate_content(self, prompt, request_options: Dict = None, **kwargs) -> StubGeminiResponse:
+        delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        timeout = (request_options or {}).get('timeout')
+        if timeout is not None and delay > timeout:
+            # Like the real client, give up at the request timeout
+            time.sleep(timeout)
+            raise TimeoutError(f"Simulated Gemini timeout after {timeout}s")
+        if delay > 0:
+            time.sleep(delay)
+        if self.failure_rate and self._rng.random() < self.failure_rate:
+            raise RuntimeError("Simulated Gemini API failure")
+        return StubGeminiResponse(self.text)
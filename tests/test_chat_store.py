@@ -0,0 +1,109 @@
+import pytest
+
+from chat_store import ChatStore, new_chat_id, is_valid_chat_id
+from database import create_chat_indexes
+from in_memory_mongo import InMemoryMongoClient
+
+
+@pytest.fixture
+def collection():
+    collection = InMemoryMongoClient()['book_recommender']['chats']
+    create_chat_indexes(collection)
+    return collection
+
+
+@pytest.fixture
+def store(collection):
+    # Flushes happen only when a test asks for them
+    store = ChatStore(collection, flush_interval=3600)
+    yield store
+    store.close()
+
+
+def message(content, role='user'):
+    return {'role': role, 'content': content, 'timestamp': '2024-01-01T00:00:00+00:00'}
+
+
+def contents(history):
+    return [m['content'] for m in history['messages']]
+
+
+def test_chat_ids_are_unguessable_and_validated():
+    chat_id = new_chat_id()
+    assert is_valid_chat_id(chat_id)
+    assert chat_id != new_chat_id()
+    assert not is_valid_chat_id('1700000000000')
+    assert not is_valid_chat_id(None)
+
+
+def test_append_returns_cursor_and_flush_stores_with_seq(store, collection):
+    chat_id = new_chat_id()
+    assert store.append(chat_id, 0, [message('a'), message('b', 'assistant')]) == 2
+    assert store.append(chat_id, 2, [message('c')]) == 3
+    assert store.flush() == 3
+    stored = sorted(collection.find({'chat_id': chat_id}), key=lambda m: m['seq'])
+    assert [(m['seq'], m['content']) for m in stored] == [(0, 'a'), (1, 'b'), (2, 'c')]
+    assert store.flush() == 0
+
+
+def test_history_merges_stored_and_buffered_messages(store):
+    chat_id = new_chat_id()
+    store.append(chat_id, 0, [message('a'), message('b')])
+    store.flush()
+    store.append(chat_id, 2, [message('c')])
+    store.append(new_chat_id(), 0, [message('other chat')])
+
+    history = store.get_history(chat_id)
+    assert contents(history) == ['a', 'b', 'c']
+    assert history['next_cursor'] == 3
+    assert not history['has_more']
+
+
+def test_history_pages_across_stored_and_buffered(store):
+    chat_id = new_chat_id()
+    store.append(chat_id, 0, [message('a'), message('b')])
+    store.flush()
+    store.append(chat_id, 2, [message('c'), message('d')])
+
+    first = store.get_history(chat_id, limit=3)
+    assert contents(first) == ['a', 'b', 'c']
+    assert first['has_more']
+    second = store.get_history(chat_id, after=first['next_cursor'], limit=3)
+    assert contents(second) == ['d']
+    assert not second['has_more']
+
+
+def test_first_write_wins_while_buffered(store):
+    chat_id = new_chat_id()
+    store.append(chat_id, 0, [message('first')])
+    store.append(chat_id, 0, [message('retry')])
+    assert contents(store.get_history(chat_id)) == ['first']
+    store.flush()
+    assert contents(store.get_history(chat_id)) == ['first']
+
+
+def test_first_write_wins_once_stored(store, collection):
+    chat_id = new_chat_id()
+    store.append(chat_id, 0, [message('first')])
+    store.flush()
+    store.append(chat_id, 0, [message('retry'), message('next')])
+    assert contents(store.get_history(chat_id)) == ['first', 'next']
+    store.flush()
+    assert contents(store.get_history(chat_id)) == ['first', 'next']
+    assert collection.count_documents({'chat_id': chat_id}) == 2
+
+
+def test_failed_flush_is_requeued(store, collection, monkeypatch):
+    chat_id = new_chat_id()
+    store.append(chat_id, 0, [message('a')])
+
+    def fail(*args, **kwargs):
+        raise ConnectionError('down')
+
+    monkeypatch.setattr(collection, 'insert_many', fail)
+    store.flush()
+    assert contents(store.get_history(chat_id)) == ['a']
+
+    monkeypatch.undo()
+    assert store.flush() == 1
+    assert collection.count_documents({'chat_id': chat_id}) == 1
@@ -0,0 +1,23 @@
+import numpy as np
+
+from title_hashes import SeenHashes, hash_titles
+
+
+def test_first_occurrence_across_batches_is_new():
+    seen = SeenHashes()
+    first = seen.add_new(hash_titles(['Dune', 'Emma', 'Dune']))
+    second = seen.add_new(hash_titles(['Emma', 'Ulysses']))
+    assert first.tolist() == [True, True, False]
+    assert second.tolist() == [False, True]
+    assert len(seen) == 3
+
+
+def test_runs_merge_without_losing_hashes():
+    seen = SeenHashes()
+    titles = [f"Book {i}" for i in range(1000)]
+    for start in range(0, len(titles), 37):
+        assert seen.add_new(hash_titles(titles[start:start + 37])).all()
+    assert len(seen) == len(titles)
+    assert len(seen.runs) <= int(np.log2(len(titles))) + 1
+    assert seen.contains(hash_titles(titles)).all()
+    assert not seen.add_new(hash_titles(titles[::-1])).any()
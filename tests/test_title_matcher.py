@@ -0,0 +1,53 @@
+from title_matcher import TitleMatcher, presented_as_title
+
+
+def test_overlapping_titles_prefer_leftmost_then_longest():
+    matcher = TitleMatcher(['The Lord', 'The Lord of the Rings', 'Rings of Power', 'Power'])
+    text = "Read The Lord of the Rings of Power first"
+    # 'Rings of Power' overlaps the longer leftmost match; the trailing 'Power' does not
+    assert matcher.find_all(text) == [(5, 26, 'The Lord of the Rings'), (30, 35, 'Power')]
+
+
+def test_matches_found_through_fail_links():
+    matcher = TitleMatcher(['a b c d', 'b c', 'c'])
+    assert [title for _, _, title in matcher.find_all("a b c x")] == ['b c']
+    assert [title for _, _, title in matcher.find_all("x c y a b c d")] == ['c', 'a b c d']
+
+
+def test_exact_text_required():
+    matcher = TitleMatcher(['Dr. No'])
+    assert matcher.find_all("Dr No and dr. no") == []
+    assert matcher.find_all("See Dr. No.") == [(4, 10, 'Dr. No')]
+
+
+def test_titles_sharing_tokens_are_all_kept():
+    matcher = TitleMatcher(['Dr. No', 'Dr No', 'Dr. No'])
+    assert len(matcher) == 2
+    text, unlisted = matcher.highlight("Both Dr No and Dr. No", ['Dr No', 'Dr. No'])
+    assert text == "Both <b>Dr No</b> and <b>Dr. No</b>"
+    assert unlisted == []
+
+
+def test_common_word_titles_left_alone_in_prose():
+    matcher = TitleMatcher(['It', 'Emma', 'The Stand'])
+    text = "It was great; Emma said it was the best read"
+    assert matcher.highlight(text, [], mode='strip') == (text, [])
+    assert matcher.highlight(text, []) == (text, [])
+
+
+def test_unlisted_titles_presented_as_titles():
+    matcher = TitleMatcher(['It', 'Emma', 'The Stand', 'Dune'])
+    text = 'Try **Emma**, "It" or The Stand next to Dune'
+    flagged, unlisted = matcher.highlight(text, ['Dune'])
+    assert flagged == 'Try **Emma**, "It" or The Stand next to <b>Dune</b>'
+    assert unlisted == ['Emma', 'It', 'The Stand']
+    stripped, _ = matcher.highlight(text, ['Dune'], mode='strip')
+    assert stripped == 'Try ,  or  next to <b>Dune</b>'
+
+
+def test_presented_as_title():
+    assert presented_as_title('a "It" b', 3, 5)
+    assert presented_as_title('a <b>It</b> b', 5, 7)
+    assert not presented_as_title('It was', 0, 2)
+    assert presented_as_title('The Stand', 0, 9)
+    assert not presented_as_title('the stand', 0, 9)
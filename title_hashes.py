@@ -0,0 +1,52 @@
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+
+def hash_titles(titles) -> np.ndarray:
+    """64-bit hash of each title, as a uint64 array"""
+    return pd.util.hash_pandas_object(pd.Series(titles, dtype=object), index=False).to_numpy()
+
+
+class SeenHashes:
+    """Set of 64-bit title hashes held as sorted numpy runs, 8 bytes per entry.
+
+    Runs are merged when a newer run grows as large as the one before it, so
+    each hash is re-sorted O(log n) times in total rather than once per add,
+    and membership is one binary search per run. Two distinct titles sharing
+    a hash would count as one; at 10M titles the odds are about 1 in 400,000.
+    """
+
+    def __init__(self):
+        self.runs: List[np.ndarray] = []
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def contains(self, hashes: np.ndarray) -> np.ndarray:
+        """Boolean mask of the hashes already in the set"""
+        found = np.zeros(len(hashes), dtype=bool)
+        for run in self.runs:
+            positions = np.minimum(np.searchsorted(run, hashes), len(run) - 1)
+            found |= run[positions] == hashes
+        return found
+
+    def add_new(self, hashes: np.ndarray) -> np.ndarray:
+        """Add hashes and return a mask of those that were not seen before.
+
+        Within one call only the first occurrence of a repeated hash counts as new.
+        """
+        _, first = np.unique(hashes, return_index=True)
+        new = np.zeros(len(hashes), dtype=bool)
+        new[first] = True
+        new &= ~self.contains(hashes)
+        if new.any():
+            self.count += int(new.sum())
+            self.runs.append(np.sort(hashes[new]))
+            while len(self.runs) > 1 and len(self.runs[-1]) >= len(self.runs[-2]):
+                newer = self.runs.pop()
+                # Two sorted runs: the stable sort merges them in linear time
+                self.runs[-1] = np.sort(np.concatenate([self.runs[-1], newer]), kind='stable')
+        return new
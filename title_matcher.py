@@ -0,0 +1,158 @@
+import re
+from typing import Iterable, List, Optional, Tuple
+
+WORD_PATTERN = re.compile(r'\w+')
+# Markup that presents a span as a title: quotes, markdown emphasis, HTML bold/italic
+TITLE_OPENERS = ('"', "'", '\u201c', '\u2018', '*', '_', '<b>', '<strong>', '<i>', '<em>')
+TITLE_CLOSERS = ('"', "'", '\u201d', '\u2019', '*', '_', '</b>', '</strong>', '</i>', '</em>')
+
+
+class TitleMatcher:
+    """Aho-Corasick automaton over catalog titles for single-pass highlighting.
+
+    The automaton runs over word tokens rather than characters, which keeps it
+    small for large catalogs and gives word-boundary matching for free. Each
+    candidate is then checked against the exact title text, so punctuation and
+    spacing must match just like the old str.replace approach.
+    """
+
+    def __init__(self, titles: Iterable[str]):
+        self.titles = []
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]      # ids of the titles ending exactly at this node
+        self._output_link = [0]  # nearest node on the fail chain with an output
+        self._depth = [0]
+        for title in titles:
+            self._add(title)
+        self._build_links()
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def _add(self, title: str):
+        tokens = WORD_PATTERN.findall(title)
+        if not tokens:
+            return
+        node = 0
+        for token in tokens:
+            next_node = self._goto[node].get(token)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._output_link.append(0)
+                self._depth.append(self._depth[node] + 1)
+                self._goto[node][token] = next_node
+            node = next_node
+        # Titles differing only in punctuation ('Dr. No', 'Dr No') share a node
+        if all(self.titles[title_id] != title for title_id in self._output[node]):
+            self._output[node].append(len(self.titles))
+            self.titles.append(title)
+
+    def _build_links(self):
+        # Breadth-first so every fail target is finished before it is used
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for token, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(token, 0)
+                self._fail[child] = target if target != child else 0
+                fail = self._fail[child]
+                self._output_link[child] = fail if self._output[fail] else self._output_link[fail]
+
+    def find_all(self, text: str) -> List[Tuple[int, int, str]]:
+        """Non-overlapping (start, end, title) matches, leftmost then longest first"""
+        token_starts = []
+        candidates = []
+        node = 0
+        goto, fail = self._goto, self._fail
+        for position, word in enumerate(WORD_PATTERN.finditer(text)):
+            token, token_end = word.group(), word.end()
+            token_starts.append(word.start())
+            while node and token not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(token, 0)
+            match_node = node if self._output[node] else self._output_link[node]
+            while match_node:
+                start = token_starts[position - self._depth[match_node] + 1]
+                for title_id in self._output[match_node]:
+                    title = self.titles[title_id]
+                    if text[start:token_end] == title:
+                        candidates.append((start, token_end, title))
+                match_node = self._output_link[match_node]
+
+        candidates.sort(key=lambda match: (match[0], -match[1]))
+        matches = []
+        last_end = -1
+        for start, end, title in candidates:
+            if start >= last_end:
+                matches.append((start, end, title))
+                last_end = end
+        return matches
+
+    def highlight(self, text: str, allowed_titles: Iterable[str], template: str = '<b>{}</b>',
+                  mode: str = 'flag') -> Tuple[str, List[str]]:
+        """Wrap allowed titles with template in one pass over text.
+
+        Catalog titles outside allowed_titles are returned (deduplicated) as the second value.
+        mode='flag' leaves them in the text, mode='strip' removes them. Only
+        mentions presented as titles count (see presented_as_title), so a
+        catalog title like "It" is not flagged in ordinary prose.
+        """
+        allowed = set(allowed_titles)
+        pieces = []
+        unlisted = []
+        cursor = 0
+        for start, end, title in self.find_all(text):
+            if title in allowed:
+                pieces.append(text[cursor:start])
+                pieces.append(template.format(title))
+            elif not presented_as_title(text, start, end):
+                pieces.append(text[cursor:end])
+            else:
+                unlisted.append(title)
+                if mode == 'strip':
+                    # Drop the quotes or emphasis around it too, not just the words
+                    start, end = _unwrap_title(text, start, end, cursor)
+                    pieces.append(text[cursor:start])
+                else:
+                    pieces.append(text[cursor:end])
+            cursor = end
+        pieces.append(text[cursor:])
+        return ''.join(pieces), list(dict.fromkeys(unlisted))
+
+
+def _title_wrapper(text: str, start: int, end: int) -> Optional[Tuple[str, str]]:
+    for opener, closer in zip(TITLE_OPENERS, TITLE_CLOSERS):
+        if text.endswith(opener, 0, start) and text.startswith(closer, end):
+            return opener, closer
+    return None
+
+
+def _unwrap_title(text: str, start: int, end: int, lower_bound: int = 0) -> Tuple[int, int]:
+    """Widen a title span over the quotes or emphasis wrapped around it, e.g. **"Title"**"""
+    wrapper = _title_wrapper(text, start, end)
+    while wrapper and start - len(wrapper[0]) >= lower_bound:
+        start, end = start - len(wrapper[0]), end + len(wrapper[1])
+        wrapper = _title_wrapper(text, start, end)
+    return start, end
+
+
+def presented_as_title(text: str, start: int, end: int) -> bool:
+    """Whether text[start:end] reads as a title rather than ordinary words.
+
+    True when the span is wrapped in quotes or emphasis, or when it is at
+    least two words with two or more of them capitalized ("The Stand").
+    """
+    if _title_wrapper(text, start, end):
+        return True
+    words = WORD_PATTERN.findall(text[start:end])
+    return len(words) >= 2 and sum(word[0].isupper() for word in words) >= 2
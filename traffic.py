@@ -0,0 +1,63 @@
+import json
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import List, Dict
+
+# Traffic files use the same JSONL shape as requests.jsonl in the repo root:
+#   {"request_id": ..., "title": ..., "body": ...}
+# body is the user query. title is the route when it starts with "/", otherwise
+# a free-form label and the request is replayed against /get_recommendation.
+DEFAULT_PATH = '/get_recommendation'
+
+
+def load_traffic(path: str) -> List[Dict]:
+    """Read a JSONL traffic file into replayable records"""
+    records = []
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"Skipping malformed line {line_number}: {str(e)}")
+                continue
+            if not entry.get('body'):
+                continue
+            title = entry.get('title') or ''
+            records.append({
+                'request_id': entry.get('request_id') or f"line-{line_number}",
+                'path': title if title.startswith('/') else DEFAULT_PATH,
+                'query': entry['body'],
+                'chat_id': entry.get('chat_id')
+            })
+    return records
+
+
+class TrafficRecorder:
+    """Append live requests to a JSONL file that load_test.py can replay"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def record(self, path: str, query: str, chat_id: str = None):
+        entry = {
+            'request_id': uuid.uuid4().hex,
+            'title': path,
+            'body': query,
+            'timestamp': datetime.now(timezone.utc).isoformat()
+        }
+        if chat_id:
+            entry['chat_id'] = chat_id
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
@@ -1,37 +1,34 @@
-from database import DatabaseManager
-import pandas as pd
+from database import DatabaseManager, BOOK_FIELDS
+
+FIELD_LABELS = {'book_name': 'Titles', 'summaries': 'Summaries', 'categories': 'Categories'}
 
 def validate_database():
     try:
         db = DatabaseManager()
-        books = db.get_all_books()
+        # Counted by an aggregation on the server; no documents are downloaded
+        report = db.field_quality_report(BOOK_FIELDS)
         
         print("\nData Validation Report:")
         print("-----------------------")
-        print(f"Total books: {len(books)}")
-        
-        # Check for missing or invalid values
-        missing_titles = sum(1 for book in books if not book.get('book_name'))
-        missing_summaries = sum(1 for book in books if not book.get('summaries'))
-        missing_categories = sum(1 for book in books if not book.get('categories'))
+        print(f"Total books: {report['total']}")
         
+        # Absent, null or empty values
         print(f"\nMissing Values:")
-        print(f"- Titles: {missing_titles}")
-        print(f"- Summaries: {missing_summaries}")
-        print(f"- Categories: {missing_categories}")
-        
-        # Check data types
-        invalid_titles = sum(1 for book in books if not isinstance(book.get('book_name', ''), str))
-        invalid_summaries = sum(1 for book in books if not isinstance(book.get('summaries', ''), str))
-        invalid_categories = sum(1 for book in books if not isinstance(book.get('categories', ''), str))
+        for field in BOOK_FIELDS:
+            print(f"- {FIELD_LABELS[field]}: {report['missing'][field]}")
         
+        # Values stored with a type other than string
         print(f"\nInvalid Data Types:")
-        print(f"- Titles: {invalid_titles}")
-        print(f"- Summaries: {invalid_summaries}")
-        print(f"- Categories: {invalid_categories}")
+        for field in BOOK_FIELDS:
+            print(f"- {FIELD_LABELS[field]}: {report['invalid'][field]}")
+            if report['invalid'][field]:
+                types = db.field_type_counts(field)
+                breakdown = ", ".join(f"{name}: {count}" for name, count in sorted(types.items())
+                                      if name not in ('string', 'missing', 'null'))
+                print(f"  ({breakdown})")
         
     except Exception as e:
         print(f"Validation failed: {str(e)}")
 
 if __name__ == "__main__":
-    validate_database() 
\ No newline at end of file
+    validate_database()
@@ -1,19 +1,38 @@
-from database import DatabaseManager
+import sys
+
 import pandas as pd
 
-def verify_book_counts():
+from database import DatabaseManager
+from title_hashes import SeenHashes, hash_titles
+
+CSV_CHUNK_SIZE = 50000
+
+def count_unique_csv_titles(csv_path: str, chunk_size: int = CSV_CHUNK_SIZE) -> int:
+    """Unique titles in the CSV, read in chunks with only the book_name column.
+
+    Titles are cleaned the same way as during ingest and kept as 64-bit hashes
+    (see SeenHashes), so client memory is bounded by 8 bytes per unique title
+    (80 MB for 10M titles) plus one chunk, not by the file size.
+    """
+    seen = SeenHashes()
+    for chunk in pd.read_csv(csv_path, usecols=['book_name'], chunksize=chunk_size):
+        titles = chunk['book_name'].dropna().astype(str).str.strip()
+        seen.add_new(hash_titles(titles[titles != '']))
+    return len(seen)
+
+def verify_book_counts(csv_path: str = "D:\\books_summary.csv"):
     try:
         # Check CSV count
-        df = pd.read_csv("D:\\books_summary.csv")
-        df = df.drop_duplicates(subset=['book_name'], keep='first')
-        csv_count = len(df)
+        csv_count = count_unique_csv_titles(csv_path)
         print(f"Unique books in CSV: {csv_count}")
         
-        # Check MongoDB count
+        # Check MongoDB count, on the server
         db = DatabaseManager()
-        mongo_books = db.get_all_books()
-        mongo_count = len(mongo_books)
+        mongo_count = db.count_books()
         print(f"Books in MongoDB: {mongo_count}")
+        distinct_titles = db.count_distinct_titles()
+        if distinct_titles != mongo_count:
+            print(f"⚠️ {mongo_count - distinct_titles} documents share a title with another document")
         
         # Verify counts match
         if csv_count == mongo_count:
@@ -26,4 +45,4 @@ def verify_book_counts():
         print(f"Verification failed: {str(e)}")
 
 if __name__ == "__main__":
-    verify_book_counts() 
\ No newline at end of file
+    verify_book_counts(*sys.argv[1:2])